@@ -0,0 +1,134 @@
+"""Vectorized outlier statistics and streaming activity counters for behavioral analysis"""
+from typing import Dict, List, Optional
+import numpy as np
+
+
+def rolling_zscores(values: np.ndarray, window: int, min_periods: int = 10) -> np.ndarray:
+    """Z-score of each value against the `window` values before it, in O(n) via cumulative sums"""
+    x = np.asarray(values, dtype=np.float64)
+    n = len(x)
+    if n == 0:
+        return np.zeros(0)
+    # Centring first keeps the sum-of-squares cancellation small for large magnitudes like wei
+    x = x - np.median(x)
+    sums = np.concatenate(([0.0], np.cumsum(x)))
+    squares = np.concatenate(([0.0], np.cumsum(x * x)))
+
+    index = np.arange(n)
+    start = np.maximum(0, index - window)
+    count = index - start
+    safe_count = np.maximum(count, 1)
+    mean = (sums[index] - sums[start]) / safe_count
+    variance = (squares[index] - squares[start]) / safe_count - mean * mean
+    std = np.sqrt(np.clip(variance, 0.0, None))
+
+    valid = (count >= min_periods) & (std > 0)
+    scores = np.zeros(n)
+    scores[valid] = (x[valid] - mean[valid]) / std[valid]
+    return scores
+
+
+def series_anomalies(values: np.ndarray, window: int, z_threshold: float = 3.0,
+                     fence: float = 3.0) -> Dict:
+    """Percentiles plus rolling z-score and interquartile-fence outliers of one series"""
+    x = np.asarray(values, dtype=np.float64)
+    p25, p50, p75, p95, p99 = np.percentile(x, [25, 50, 75, 95, 99])
+    upper_fence = p75 + fence * (p75 - p25)
+    scores = rolling_zscores(x, window)
+    outliers = (scores > z_threshold) | (x > upper_fence)
+    return {
+        'p50': float(p50),
+        'p95': float(p95),
+        'p99': float(p99),
+        'mean': float(x.mean()),
+        'std': float(x.std()),
+        'upper_fence': float(upper_fence),
+        'max_zscore': round(float(scores.max()), 3),
+        'zscore_outliers': int((scores > z_threshold).sum()),
+        'fence_outliers': int((x > upper_fence).sum()),
+        'outliers': outliers
+    }
+
+
+def gas_anomalies(blocks: np.ndarray, gas_used: np.ndarray, gas_price: np.ndarray,
+                  window: int = 100, z_threshold: float = 3.0, fence: float = 3.0) -> Dict:
+    """Gas used and gas price outliers, in block order"""
+    order = np.argsort(blocks, kind='stable')
+    blocks = np.asarray(blocks)[order]
+    usage = series_anomalies(np.asarray(gas_used)[order], window, z_threshold, fence)
+    price = series_anomalies(np.asarray(gas_price)[order], window, z_threshold, fence)
+    combined = usage.pop('outliers') | price.pop('outliers')
+    return {
+        'transactions': len(blocks),
+        'gas_used': usage,
+        'gas_price': price,
+        'outlier_count': int(combined.sum()),
+        'outlier_fraction': float(combined.mean()) if len(blocks) else 0.0,
+        'outlier_blocks': blocks[combined].tolist()
+    }
+
+
+class BlockRingCounter:
+    """Event counts in fixed-width block buckets, kept in a ring so memory stays O(buckets)"""
+
+    def __init__(self, bucket_blocks: int, buckets: int):
+        self.bucket_blocks = bucket_blocks
+        self.counts = np.zeros(buckets, dtype=np.int64)
+        self.head: Optional[int] = None
+        self.first: Optional[int] = None
+
+    def advance(self, block: int):
+        """Move the newest bucket up to `block`, zeroing the buckets it passes over"""
+        bucket = block // self.bucket_blocks
+        if self.head is None:
+            self.head = self.first = bucket
+            return
+        if bucket <= self.head:
+            return
+        skipped = min(bucket - self.head, len(self.counts))
+        slots = (self.head + 1 + np.arange(skipped)) % len(self.counts)
+        self.counts[slots] = 0
+        self.head = bucket
+
+    def add(self, block: int, count: int = 1):
+        self.advance(block)
+        bucket = block // self.bucket_blocks
+        # Older than the ring, or from before the first indexed block
+        if bucket <= self.head - len(self.counts) or bucket < self.first:
+            return
+        self.counts[bucket % len(self.counts)] += count
+
+    def add_blocks(self, blocks: np.ndarray):
+        """Count one event per block number, for a whole page of logs at once"""
+        blocks = np.asarray(blocks, dtype=np.int64)
+        if not len(blocks):
+            return
+        self.advance(int(blocks.max()))
+        buckets = blocks // self.bucket_blocks
+        buckets = buckets[(buckets > self.head - len(self.counts)) & (buckets >= self.first)]
+        np.add.at(self.counts, buckets % len(self.counts), 1)
+
+    def series(self) -> np.ndarray:
+        """Counts oldest to newest, limited to buckets observed since indexing began"""
+        if self.head is None:
+            return np.zeros(0, dtype=np.int64)
+        size = min(len(self.counts), self.head - self.first + 1)
+        slots = (self.head - size + 1 + np.arange(size)) % len(self.counts)
+        return self.counts[slots]
+
+    def bucket_start(self, offset_from_oldest: int) -> int:
+        """First block of a bucket in series() order"""
+        size = len(self.series())
+        return (self.head - size + 1 + offset_from_oldest) * self.bucket_blocks
+
+
+def detect_spikes(counts: np.ndarray, threshold: float = 4.0, min_events: int = 10) -> List[int]:
+    """Indices of buckets far above the median, by median absolute deviation"""
+    if len(counts) < 4:
+        return []
+    median = np.median(counts)
+    # Scaled MAD estimates the standard deviation; the floor keeps sparse series from flagging noise
+    spread = max(1.4826 * np.median(np.abs(counts - median)), 1.0)
+    spikes = (counts - median) / spread > threshold
+    spikes &= counts >= min_events
+    return np.flatnonzero(spikes).tolist()
@@ -0,0 +1,243 @@
+"""Per-detector cost in ns/byte, and risk scoring throughput in ops/sec
+
+Bytecode corpus: the mock node's fixture contracts, synthetic
+compiler-like code, and adversarial shapes (every byte a JUMPDEST,
+dense CALL/SSTORE jump chains, PUSH32 runs) from 1KB up to the
+EIP-170 limit of 24KB. Source corpus: realistic Solidity and the
+backtracking input from bench_scanner.
+
+Run from the repository root:
+
+    python benchmarks/bench_detectors.py
+    python benchmarks/bench_detectors.py --json benchmarks/results/detectors.json
+"""
+import sys
+import argparse
+import asyncio
+import json
+import random
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+project_dir = Path(__file__).parent.parent
+sys.path.append(str(project_dir))
+
+import evm
+import workers
+from model import EnhancedSecurityAnalyzer
+from scanner import MultiPatternScanner
+from bench_scanner import solidity_source, adversarial
+from mock_rpc import MockChain, load_fixture
+
+SIZES = [1024, 2048, 4096, 8192, 16384, 24576]
+REPEATS = 5
+SCORING_CALLS = 20000
+
+
+def best_of(func: Callable, *args) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def compiler_like(size: int, seed: int = 0) -> bytes:
+    """Blocks of stack, memory and storage ops joined by resolvable jumps, with a few external calls"""
+    rng = random.Random(seed)
+    code = bytearray(bytes.fromhex('6080604052'))
+    jumpdests = []
+    while len(code) < size - 40:
+        jumpdests.append(len(code))
+        code.append(evm.JUMPDEST)
+        for _ in range(rng.randrange(3, 12)):
+            choice = rng.random()
+            if choice < 0.35:
+                code += bytes([0x60]) + bytes([rng.randrange(256)])
+            elif choice < 0.45:
+                code += bytes([0x7f]) + rng.randbytes(32)
+            elif choice < 0.7:
+                code.append(rng.choice([0x01, 0x02, 0x03, 0x10, 0x14, 0x16, 0x50, 0x80, 0x81, 0x90, 0x91]))
+            elif choice < 0.85:
+                code.append(rng.choice([0x51, 0x52, 0x54]))
+            elif choice < 0.97:
+                code.append(evm.SSTORE)
+            else:
+                code.append(evm.CALL)
+        target = rng.choice(jumpdests)
+        code += bytes([0x61]) + target.to_bytes(2, 'big') + bytes([rng.choice([evm.JUMP, evm.JUMPI])])
+    return bytes(code[:size])
+
+
+def all_jumpdests(size: int) -> bytes:
+    """Every instruction starts a basic block"""
+    return bytes([evm.JUMPDEST]) * size
+
+
+def call_sstore_chain(size: int) -> bytes:
+    """Blocks that each CALL and jump to the next, with the only SSTORE in the last one"""
+    code = bytearray()
+    while len(code) + 8 <= size:
+        next_block = len(code) + 6
+        code += bytes([evm.JUMPDEST, evm.CALL, 0x61]) + next_block.to_bytes(2, 'big') + bytes([evm.JUMP])
+    code += bytes([evm.JUMPDEST, evm.SSTORE])
+    return bytes(code.ljust(size, b'\x00'))
+
+
+def push32_runs(size: int) -> bytes:
+    """PUSH32 whose immediates are themselves PUSH32 bytes, stressing the instruction mask"""
+    return bytes([0x7f]) * size
+
+
+def bytecode_corpus() -> Dict[str, Callable[[int], bytes]]:
+    return {
+        'compiler_like': compiler_like,
+        'all_jumpdests': all_jumpdests,
+        'call_sstore_chain': call_sstore_chain,
+        'push32_runs': push32_runs,
+    }
+
+
+def fixture_contracts() -> Dict[str, bytes]:
+    chain = MockChain(load_fixture(None))
+    return {address[:6]: evm.to_bytes(code) for address, code in chain.code.items()}
+
+
+def bytecode_stages(analyzer: EnhancedSecurityAnalyzer) -> Dict[str, Callable]:
+    """Each stage on its own, given the raw bytes and a prebuilt disassembly and CFG
+
+    Detectors run against the shared disassembly, so their cost excludes decoding.
+    """
+    stages = {
+        'disassemble': lambda raw, disassembly, cfg: evm.Disassembly(raw),
+        'cfg': lambda raw, disassembly, cfg: evm.ControlFlowGraph(disassembly),
+        'reentrant_calls': lambda raw, disassembly, cfg: cfg.calls_before_state_write(),
+    }
+    detectors = {**analyzer.opcode_detectors, **analyzer.opcode_observations}
+    for name, opcodes in detectors.items():
+        stages[name] = lambda raw, disassembly, cfg, detector={name: opcodes}: evm.detect_opcodes(
+            disassembly, detector
+        )
+
+    def findings(raw: bytes, disassembly, cfg):
+        # From raw bytes: disassembly, CFG and every detector, as a worker runs them
+        return workers.bytecode_findings(raw, detectors, 20)
+    stages['all_bytecode'] = findings
+    return stages
+
+
+def source_stages(analyzer: EnhancedSecurityAnalyzer) -> Dict[str, Callable[[str], object]]:
+    stages = {
+        name: MultiPatternScanner({name: pattern}).scan
+        for name, pattern in analyzer.vulnerability_patterns.items()
+    }
+    stages['all_patterns'] = MultiPatternScanner(analyzer.vulnerability_patterns).scan
+    return stages
+
+
+def end_to_end(analyzer: EnhancedSecurityAnalyzer, code: str) -> float:
+    """_analyze_code_security with the analysis cache cleared before every run"""
+    loop = asyncio.new_event_loop()
+    try:
+        def run():
+            analyzer.analysis_cache.clear()
+            loop.run_until_complete(analyzer._analyze_code_security(code))
+        return best_of(run)
+    finally:
+        loop.close()
+
+
+def bench_code(analyzer: EnhancedSecurityAnalyzer) -> List[Dict]:
+    rows = []
+
+    def record(kind: str, label: str, size: int, stage: str, seconds: float):
+        rows.append({
+            'kind': kind, 'input': label, 'bytes': size, 'stage': stage,
+            'ms': round(seconds * 1000, 4), 'ns_per_byte': round(seconds * 1e9 / size, 2)
+        })
+        print(f"{kind:<10}{label:<20}{size:>8}  {stage:<24}{seconds * 1000:>10.3f}{seconds * 1e9 / size:>12.1f}")
+
+    print(f"{'kind':<10}{'input':<20}{'bytes':>8}  {'stage':<24}{'ms':>10}{'ns/B':>12}")
+    stages = bytecode_stages(analyzer)
+    inputs = [(f"fixture_{name}", raw) for name, raw in fixture_contracts().items()]
+    for label, generate in bytecode_corpus().items():
+        inputs.extend((label, generate(size)) for size in SIZES)
+    for label, raw in inputs:
+        disassembly = evm.Disassembly(raw)
+        cfg = evm.ControlFlowGraph(disassembly)
+        for stage, func in stages.items():
+            record('bytecode', label, len(raw), stage, best_of(func, raw, disassembly, cfg))
+        record('bytecode', label, len(raw), 'analyze_code_security', end_to_end(analyzer, '0x' + raw.hex()))
+
+    stages = source_stages(analyzer)
+    for label, generate in (('source', solidity_source), ('adversarial', adversarial)):
+        for size in SIZES:
+            code = generate(size)
+            for stage, func in stages.items():
+                record('source', label, size, stage, best_of(func, code))
+            record('source', label, size, 'analyze_code_security', end_to_end(analyzer, code))
+    return rows
+
+
+def scoring_inputs(vulnerability_count: int) -> Dict:
+    severities = ['critical', 'high', 'medium', 'low']
+    behavior_types = ['high_value_transfers', 'unusual_gas_patterns', 'irregular_activity_spikes',
+                      'transaction_frequency']
+    return {
+        'code_security': {'vulnerabilities': [
+            {'type': 'reentrancy', 'severity': severities[i % 4], 'confidence': 0.5 + (i % 5) / 10}
+            for i in range(vulnerability_count)
+        ]},
+        'attack_surface': {
+            'external_calls': [{'name': f'call{i}', 'risk': 'high' if i % 3 else 'low'}
+                               for i in range(min(vulnerability_count, 50))],
+            'dependencies': [f'dep{i}' for i in range(min(vulnerability_count, 20))]
+        },
+        'behavior': {'behavioral_patterns': [
+            {'type': behavior_types[i % 4], 'severity': 0.5}
+            for i in range(min(vulnerability_count, 100))
+        ]}
+    }
+
+
+def bench_scoring(analyzer: EnhancedSecurityAnalyzer) -> List[Dict]:
+    rows = []
+    print(f"\n{'scorer':<32}{'findings':>10}{'ops/sec':>14}")
+    for count in (0, 5, 50, 5000):
+        inputs = scoring_inputs(count)
+        calls = max(10, SCORING_CALLS // max(1, count // 50))
+        scorers = {
+            '_calculate_overall_risk': lambda: analyzer._calculate_overall_risk(
+                inputs['code_security'], inputs['attack_surface'], inputs['behavior']),
+            '_calculate_vulnerability_risk': lambda: analyzer._calculate_vulnerability_risk(inputs['code_security']),
+            '_calculate_surface_risk': lambda: analyzer._calculate_surface_risk(inputs['attack_surface']),
+            '_calculate_behavioral_risk': lambda: analyzer._calculate_behavioral_risk(inputs['behavior']),
+        }
+        for name, scorer in scorers.items():
+            def run():
+                for _ in range(calls):
+                    scorer()
+            ops = calls / best_of(run)
+            rows.append({'scorer': name, 'findings': count, 'ops_per_sec': round(ops)})
+            print(f"{name:<32}{count:>10}{ops:>14,.0f}")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    analyzer = EnhancedSecurityAnalyzer()
+    report = {'detectors': bench_code(analyzer), 'scoring': bench_scoring(analyzer)}
+    if args.json:
+        output = Path(args.json)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2) + '\n')
+        print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
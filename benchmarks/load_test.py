@@ -0,0 +1,273 @@
+"""Load test of POST /api/security/analyze against the local mock RPC node
+
+Starts benchmarks/mock_rpc.py and the FastAPI app (pointed at it through
+MOCK_RPC_URL) as subprocesses, then drives the analyze endpoint with a
+closed loop of concurrent clients at each concurrency level. Records
+throughput, latency percentiles and the server's event-loop lag (from
+its /metrics histogram), and writes a JSON report.
+
+Run from the repository root:
+
+    python benchmarks/load_test.py --levels 1,8,32,128 --requests 500
+    python benchmarks/load_test.py --baseline benchmarks/results/previous.json
+"""
+import sys
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+project_dir = Path(__file__).parent.parent
+RESULTS_DIR = Path(__file__).parent / 'results'
+
+FIXTURE_CONTRACTS = [
+    '0x1000000000000000000000000000000000000001',
+    '0x2000000000000000000000000000000000000002',
+    '0x3000000000000000000000000000000000000003',
+    '0x4000000000000000000000000000000000000004',
+    '0x5000000000000000000000000000000000000005',
+]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url: str, timeout: float = 30.0, method: str = 'GET', **kwargs):
+    """Poll a URL until the server behind it answers"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.request(method, url, timeout=1.0, **kwargs)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def start_servers(args) -> List[subprocess.Popen]:
+    mock_url = f"http://127.0.0.1:{args.mock_port}"
+    mock = subprocess.Popen([
+        sys.executable, str(Path(__file__).parent / 'mock_rpc.py'),
+        '--port', str(args.mock_port),
+        '--latency-ms', str(args.rpc_latency_ms),
+        '--jitter-ms', str(args.rpc_jitter_ms),
+        '--error-rate', str(args.rpc_error_rate),
+        '--synthesize-code', str(args.code_size),
+        '--seed', str(args.seed),
+    ])
+    processes = [mock]
+    wait_for(mock_url, method='POST', json={'jsonrpc': '2.0', 'id': 1, 'method': 'eth_blockNumber', 'params': []})
+
+    env = dict(os.environ, MOCK_RPC_URL=mock_url, RPC_CONNECT_ON_STARTUP='true')
+    app = subprocess.Popen([
+        sys.executable, '-m', 'uvicorn', 'main:app',
+        '--host', '127.0.0.1', '--port', str(args.app_port), '--log-level', 'warning'
+    ], cwd=project_dir, env=env, stdout=subprocess.DEVNULL)
+    processes.append(app)
+    wait_for(f"http://127.0.0.1:{args.app_port}/metrics")
+    return processes
+
+
+def parse_histogram(text: str, name: str) -> Dict:
+    """Cumulative buckets, sum and count of an unlabelled histogram in Prometheus text format"""
+    buckets, total, count = [], 0.0, 0
+    for line in text.splitlines():
+        if line.startswith(name + '_bucket'):
+            bound = line.split('le="')[1].split('"')[0]
+            buckets.append((float('inf') if bound == '+Inf' else float(bound), float(line.rsplit(' ', 1)[1])))
+        elif line.startswith(name + '_sum'):
+            total = float(line.rsplit(' ', 1)[1])
+        elif line.startswith(name + '_count'):
+            count = int(float(line.rsplit(' ', 1)[1]))
+    return {'buckets': buckets, 'sum': total, 'count': count}
+
+
+def loop_lag_summary(before: Dict, after: Dict) -> Dict:
+    """Mean lag and the bucket bound covering 99% of samples taken between two scrapes"""
+    count = after['count'] - before['count']
+    if count <= 0:
+        return {'samples': 0, 'mean_ms': None, 'p99_upper_bound_ms': None}
+    previous = dict(before['buckets'])
+    p99_bound = None
+    for bound, cumulative in after['buckets']:
+        if cumulative - previous.get(bound, 0) >= 0.99 * count:
+            p99_bound = bound
+            break
+    return {
+        'samples': count,
+        'mean_ms': round((after['sum'] - before['sum']) / count * 1000, 3),
+        'p99_upper_bound_ms': None if p99_bound in (None, float('inf')) else p99_bound * 1000
+    }
+
+
+async def scrape_loop_lag(client: httpx.AsyncClient, base_url: str) -> Dict:
+    response = await client.get(f"{base_url}/metrics")
+    return parse_histogram(response.text, 'netpack_event_loop_lag_seconds')
+
+
+def contract_for(index: int, args) -> str:
+    if args.mode == 'warm':
+        return FIXTURE_CONTRACTS[index % len(FIXTURE_CONTRACTS)]
+    # Unknown addresses get unique synthesized code, so nothing is served from cache
+    return '0xfeed' + format(args.seed * 10 ** 12 + index, '036x')
+
+
+async def run_level(client: httpx.AsyncClient, base_url: str, concurrency: int,
+                    args, offset: int) -> Dict:
+    latencies = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < args.requests:
+            index = next_index
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                response = await client.post(
+                    f"{base_url}/api/security/analyze",
+                    json={'contract': contract_for(offset + index, args), 'chain': 'ethereum'}
+                )
+                failed = response.status_code != 200 or 'error' in response.json()
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    lag_before = await scrape_loop_lag(client, base_url)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    lag_after = await scrape_loop_lag(client, base_url)
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'duration_s': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 2),
+        'latency_ms': {
+            'mean': round(float(np.mean(latencies)) * 1000, 3),
+            'p50': round(float(p50), 3),
+            'p95': round(float(p95), 3),
+            'p99': round(float(p99), 3),
+            'max': round(max(latencies) * 1000, 3)
+        },
+        'event_loop_lag': loop_lag_summary(lag_before, lag_after)
+    }
+
+
+async def run(args) -> List[Dict]:
+    base_url = f"http://127.0.0.1:{args.app_port}"
+    levels = [int(level) for level in args.levels.split(',')]
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        results = []
+        offset = 0
+        for concurrency in levels:
+            result = await run_level(client, base_url, concurrency, args, offset)
+            offset += args.requests
+            results.append(result)
+            print(f"concurrency {concurrency:>4}: {result['throughput_rps']:>8} req/s  "
+                  f"p50 {result['latency_ms']['p50']:>8} ms  p95 {result['latency_ms']['p95']:>8} ms  "
+                  f"p99 {result['latency_ms']['p99']:>8} ms  errors {result['errors']}  "
+                  f"loop lag mean {result['event_loop_lag']['mean_ms']} ms")
+        return results
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=project_dir,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: Dict, baseline: Dict):
+    """Print throughput and tail latency changes against a previous report"""
+    previous = {level['concurrency']: level for level in baseline['levels']}
+    print(f"\nAgainst baseline {baseline['meta'].get('git_revision')}:")
+    for level in report['levels']:
+        old = previous.get(level['concurrency'])
+        if old is None:
+            continue
+        throughput = (level['throughput_rps'] / old['throughput_rps'] - 1) * 100
+        p95 = (level['latency_ms']['p95'] / old['latency_ms']['p95'] - 1) * 100
+        print(f"concurrency {level['concurrency']:>4}: throughput {throughput:+.1f}%  p95 {p95:+.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--levels', default='1,8,32,128', help="Comma-separated concurrency levels")
+    parser.add_argument('--requests', type=int, default=500, help="Requests per concurrency level")
+    parser.add_argument('--mode', choices=['cold', 'warm'], default='cold',
+                        help="cold: a fresh contract per request; warm: the cached fixture contracts")
+    parser.add_argument('--code-size', type=int, default=8192, help="Bytes of synthesized code in cold mode")
+    parser.add_argument('--rpc-latency-ms', type=float, default=20.0)
+    parser.add_argument('--rpc-jitter-ms', type=float, default=5.0)
+    parser.add_argument('--rpc-error-rate', type=float, default=0.0)
+    parser.add_argument('--timeout', type=float, default=30.0, help="Client timeout per request in seconds")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--app-port', type=int, default=0, help="0 picks a free port")
+    parser.add_argument('--mock-port', type=int, default=0, help="0 picks a free port")
+    parser.add_argument('--output', help="Report path (default benchmarks/results/load_<timestamp>.json)")
+    parser.add_argument('--baseline', help="Previous report to compare against")
+    args = parser.parse_args()
+    args.app_port = args.app_port or free_port()
+    args.mock_port = args.mock_port or free_port()
+
+    processes = start_servers(args)
+    try:
+        levels = asyncio.run(run(args))
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait(timeout=10)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'analysis_workers': os.getenv('ANALYSIS_WORKERS', '0'),
+            'mode': args.mode,
+            'code_size': args.code_size,
+            'requests_per_level': args.requests,
+            'rpc_latency_ms': args.rpc_latency_ms,
+            'rpc_jitter_ms': args.rpc_jitter_ms,
+            'rpc_error_rate': args.rpc_error_rate,
+            'seed': args.seed
+        },
+        'levels': levels
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"load_{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + '\n')
+    print(f"\nReport written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+"""Local JSON-RPC stand-in serving chain state from a fixture file
+
+Serves eth_getCode, eth_getStorageAt, eth_blockNumber, eth_getBlockByNumber,
+eth_getLogs, eth_getTransactionReceipt and eth_call (single or batched) with injected latency and errors, so the
+analyzer can be benchmarked and load-tested without network access.
+
+Run from the repository root:
+
+    python benchmarks/mock_rpc.py --port 8545 --latency-ms 20 --jitter-ms 10 --error-rate 0.01
+
+then point the analyzer at it, for every chain or per chain:
+
+    MOCK_RPC_URL=http://127.0.0.1:8545 python main.py
+    ETH_RPC_URL=http://127.0.0.1:8545,http://127.0.0.1:8546 python main.py
+"""
+import sys
+import argparse
+import asyncio
+import bisect
+import hashlib
+import json
+import random
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from eth_utils import keccak
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import uvicorn
+
+DEFAULT_FIXTURE = Path(__file__).parent / 'fixtures' / 'chain.json'
+
+TRANSFER_TOPIC = '0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef'
+
+BLOCK_TAGS = {'earliest', 'latest', 'pending', 'safe', 'finalized'}
+
+
+class JSONRPCError(Exception):
+    """An error returned to the client as a JSON-RPC error object"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def _word(value: int) -> str:
+    return '0x' + format(value, '064x')
+
+
+def _topic_address(address: str) -> str:
+    return '0x' + address[2:].lower().rjust(64, '0')
+
+
+def _fake_hash(*parts) -> str:
+    return '0x' + hashlib.sha256(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+class MockChain:
+    """Chain state loaded from a fixture, with a head that can advance over time"""
+
+    def __init__(self, fixture: Dict, block_time: float = 0.0, max_logs: int = 10000,
+                 max_log_range: int = 0, seed: int = 0, synthesize_code: int = 0):
+        self.chain_id = int(fixture.get('chain_id', 1))
+        self.base_block = int(fixture['block_number'])
+        self.block_time = block_time
+        self.max_logs = max_logs
+        self.max_log_range = max_log_range
+        self.started = time.monotonic()
+        self.synthesize_code = synthesize_code
+        self.code = {
+            address.lower(): self._expand_code(code)
+            for address, code in fixture.get('code', {}).items()
+        }
+        self.storage = {
+            address.lower(): {int(slot, 16): value for slot, value in slots.items()}
+            for address, slots in fixture.get('storage', {}).items()
+        }
+        logs = list(fixture.get('logs', []))
+        rng = random.Random(seed)
+        for spec in fixture.get('transfers', []):
+            logs.extend(self._generate_transfers(spec, rng))
+        self.logs = sorted(logs, key=lambda log: (int(log['blockNumber'], 16), int(log['logIndex'], 16)))
+        self._log_blocks = [int(log['blockNumber'], 16) for log in self.logs]
+        self.transactions = {}
+        self.blooms: Dict[int, int] = {}
+        for log in self.logs:
+            self.transactions.setdefault(log['transactionHash'], log)
+            block = int(log['blockNumber'], 16)
+            self.blooms[block] = self.blooms.get(block, 0) | self._log_bloom(log)
+
+    @staticmethod
+    def _log_bloom(log: Dict) -> int:
+        """logsBloom bits of a log's address and topics"""
+        bloom = 0
+        for value in [bytes.fromhex(log['address'][2:])] + [bytes.fromhex(t[2:]) for t in log['topics']]:
+            digest = keccak(value)
+            for i in (0, 2, 4):
+                bloom |= 1 << (((digest[i] << 8) | digest[i + 1]) & 2047)
+        return bloom
+
+    @staticmethod
+    def _expand_code(code) -> str:
+        """A hex string, or {"pattern": hex, "size": bytes} repeated to the given size"""
+        if isinstance(code, str):
+            return code
+        pattern = code['pattern'][2:] if code['pattern'].startswith('0x') else code['pattern']
+        size = int(code['size'])
+        repeats = -(-size * 2 // len(pattern))
+        return '0x' + (pattern * repeats)[:size * 2]
+
+    def _generate_transfers(self, spec: Dict, rng: random.Random) -> List[Dict]:
+        """ERC-20 Transfer logs every few blocks over a range, with deterministic values"""
+        address = spec['address'].lower()
+        parties = [party.lower() for party in spec.get('parties', [])] or [
+            '0x' + format(rng.getrandbits(160), '040x') for _ in range(16)
+        ]
+        start, end = int(spec['from_block']), int(spec['to_block'])
+        every = int(spec.get('every', 1))
+        per_block = int(spec.get('per_block', 1))
+        max_value = int(spec.get('max_value', 10 ** 21))
+        logs = []
+        for block in range(start, end + 1, every):
+            for index in range(per_block):
+                sender, receiver = rng.sample(parties, 2)
+                logs.append({
+                    'address': address,
+                    'topics': [TRANSFER_TOPIC, _topic_address(sender), _topic_address(receiver)],
+                    'data': _word(rng.randrange(max_value)),
+                    'blockNumber': hex(block),
+                    'blockHash': _fake_hash('block', block),
+                    'transactionHash': _fake_hash('tx', address, block, index),
+                    'transactionIndex': hex(index),
+                    'logIndex': hex(index),
+                    'removed': False
+                })
+        return logs
+
+    @property
+    def head(self) -> int:
+        if self.block_time <= 0:
+            return self.base_block
+        return self.base_block + int((time.monotonic() - self.started) / self.block_time)
+
+    def block_number(self, tag: Any) -> int:
+        if tag is None or tag in BLOCK_TAGS:
+            return 0 if tag == 'earliest' else self.head
+        return int(tag, 16)
+
+    def call(self, method: str, params: List) -> Any:
+        handler = getattr(self, 'rpc_' + method, None)
+        if handler is None:
+            raise JSONRPCError(-32601, f"the method {method} does not exist/is not available")
+        return handler(*params)
+
+    def rpc_eth_chainId(self) -> str:
+        return hex(self.chain_id)
+
+    def rpc_net_version(self) -> str:
+        return str(self.chain_id)
+
+    def rpc_web3_clientVersion(self) -> str:
+        return 'netpack-mock-rpc/1.0'
+
+    def rpc_eth_blockNumber(self) -> str:
+        return hex(self.head)
+
+    def rpc_eth_getBlockByNumber(self, tag: Any, full_transactions: bool = False) -> Optional[Dict]:
+        """A header whose logsBloom covers the block's fixture logs"""
+        number = self.block_number(tag)
+        if number > self.head:
+            return None
+        return {
+            'number': hex(number),
+            'hash': _fake_hash('block', number),
+            'parentHash': _fake_hash('block', number - 1),
+            'timestamp': hex(1700000000 + number * 12),
+            'logsBloom': '0x' + format(self.blooms.get(number, 0), '0512x'),
+            'transactions': []
+        }
+
+    def rpc_eth_getCode(self, address: str, block: Any = 'latest') -> str:
+        code = self.code.get(address.lower())
+        if code is None and self.synthesize_code:
+            return self._synthesized_code(address.lower())
+        return code or '0x'
+
+    def _synthesized_code(self, address: str) -> str:
+        """Distinct code per unknown address, so every analysis misses the code-hash caches"""
+        body = self._expand_code({'pattern': '6080604052600160010150600035602052', 'size': self.synthesize_code})
+        # PUSH20 <address> POP keeps the suffix a valid instruction
+        return body[:-46] + '73' + address[2:] + '50'
+
+    def rpc_eth_getStorageAt(self, address: str, slot: str, block: Any = 'latest') -> str:
+        value = self.storage.get(address.lower(), {}).get(int(slot, 16), 0)
+        return _word(int(value, 16) if isinstance(value, str) else int(value))
+
+    def rpc_eth_call(self, transaction: Dict, block: Any = 'latest') -> str:
+        return '0x'
+
+    def rpc_eth_getTransactionReceipt(self, transaction_hash: str) -> Optional[Dict]:
+        """A receipt for any transaction behind a fixture log, with gas derived from its hash"""
+        log = self.transactions.get(transaction_hash.lower())
+        if log is None:
+            return None
+        digest = int(transaction_hash[2:18], 16)
+        block = int(log['blockNumber'], 16)
+        gas_used = 45000 + digest % 40000
+        # Base fee drifting with the block, plus a tip
+        gas_price = 20 * 10 ** 9 + (block % 500) * 10 ** 7 + (digest >> 20) % (2 * 10 ** 9)
+        # About 1% gas-heavy calls and 1% priority-fee spikes
+        if (digest >> 40) % 100 == 0:
+            gas_used *= 12
+        if (digest >> 48) % 100 == 0:
+            gas_price *= 15
+        return {
+            'transactionHash': transaction_hash,
+            'blockNumber': log['blockNumber'],
+            'blockHash': log['blockHash'],
+            'transactionIndex': log['transactionIndex'],
+            'status': '0x1',
+            'gasUsed': hex(gas_used),
+            'cumulativeGasUsed': hex(gas_used),
+            'effectiveGasPrice': hex(gas_price),
+            'logs': [log]
+        }
+
+    def rpc_eth_getLogs(self, log_filter: Dict) -> List[Dict]:
+        start = self.block_number(log_filter.get('fromBlock', 'latest'))
+        end = self.block_number(log_filter.get('toBlock', 'latest'))
+        if end < start:
+            raise JSONRPCError(-32602, "invalid block range params")
+        if self.max_log_range and end - start + 1 > self.max_log_range:
+            raise JSONRPCError(-32005, f"block range is too wide, max is {self.max_log_range} blocks")
+
+        addresses = log_filter.get('address')
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        addresses = {address.lower() for address in addresses} if addresses else None
+        topics = log_filter.get('topics') or []
+
+        matches = []
+        lo = bisect.bisect_left(self._log_blocks, start)
+        hi = bisect.bisect_right(self._log_blocks, end)
+        for log in self.logs[lo:hi]:
+            if addresses is not None and log['address'] not in addresses:
+                continue
+            if not self._topics_match(log['topics'], topics):
+                continue
+            matches.append(log)
+            if len(matches) > self.max_logs:
+                raise JSONRPCError(-32005, f"query returned more than {self.max_logs} results")
+        return matches
+
+    @staticmethod
+    def _topics_match(log_topics: List[str], wanted: List) -> bool:
+        for position, topic in enumerate(wanted):
+            if topic is None:
+                continue
+            options = topic if isinstance(topic, list) else [topic]
+            if position >= len(log_topics) or log_topics[position] not in {t.lower() for t in options}:
+                return False
+        return True
+
+
+def create_app(chain: MockChain, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+               error_rate: float = 0.0, http_error_rate: float = 0.0, seed: int = 0,
+               reject_batches: bool = False) -> FastAPI:
+    """JSON-RPC over HTTP with injected latency, per-call errors and per-request 503s"""
+    app = FastAPI(title="Mock JSON-RPC node")
+    rng = random.Random(seed)
+    stats = {'requests': 0, 'calls': 0, 'batches': 0, 'injected_errors': 0, 'http_errors': 0, 'methods': {}}
+
+    def answer(call: Dict) -> Dict:
+        stats['calls'] += 1
+        stats['methods'][call.get('method')] = stats['methods'].get(call.get('method'), 0) + 1
+        response = {'jsonrpc': '2.0', 'id': call.get('id')}
+        try:
+            if rng.random() < error_rate:
+                stats['injected_errors'] += 1
+                raise JSONRPCError(-32603, "injected internal error")
+            response['result'] = chain.call(call['method'], call.get('params') or [])
+        except JSONRPCError as e:
+            response['error'] = {'code': e.code, 'message': e.message}
+        except (KeyError, TypeError, ValueError) as e:
+            response['error'] = {'code': -32602, 'message': f"invalid params: {e}"}
+        return response
+
+    @app.post("/")
+    @app.post("/{path:path}")
+    async def rpc(request: Request, path: str = ''):
+        stats['requests'] += 1
+        delay = latency_ms + (rng.uniform(-jitter_ms, jitter_ms) if jitter_ms else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if rng.random() < http_error_rate:
+            stats['http_errors'] += 1
+            return JSONResponse({'error': 'injected upstream failure'}, status_code=503)
+
+        try:
+            body = json.loads(await request.body())
+        except ValueError:
+            return JSONResponse(
+                {'jsonrpc': '2.0', 'id': None, 'error': {'code': -32700, 'message': 'parse error'}}
+            )
+        if isinstance(body, list):
+            stats['batches'] += 1
+            if reject_batches:
+                # As providers without batch support answer
+                return JSONResponse(
+                    {'jsonrpc': '2.0', 'id': None, 'error': {'code': -32600, 'message': 'batch requests are not supported'}}
+                )
+            return JSONResponse([answer(call) for call in body])
+        return JSONResponse(answer(body))
+
+    @app.get("/stats")
+    async def get_stats():
+        return {**stats, 'head': chain.head}
+
+    return app
+
+
+def load_fixture(path: Optional[str]) -> Dict:
+    with open(path or DEFAULT_FIXTURE) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8545)
+    parser.add_argument('--fixture', help=f"Fixture JSON file (default {DEFAULT_FIXTURE})")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Delay added to every HTTP request")
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help="Uniform +/- jitter on the delay")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of calls answered with a JSON-RPC error")
+    parser.add_argument('--http-error-rate', type=float, default=0.0, help="Fraction of HTTP requests answered with 503")
+    parser.add_argument('--block-time', type=float, default=0.0, help="Seconds per new block; 0 keeps the head fixed")
+    parser.add_argument('--max-logs', type=int, default=10000, help="eth_getLogs result limit")
+    parser.add_argument('--max-log-range', type=int, default=0, help="eth_getLogs block range limit; 0 for none")
+    parser.add_argument('--synthesize-code', type=int, default=0, metavar='BYTES',
+                        help="Serve unique code of this size for addresses missing from the fixture")
+    parser.add_argument('--reject-batches', action='store_true', help="Answer batch payloads with a single error")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    chain = MockChain(
+        load_fixture(args.fixture), block_time=args.block_time, max_logs=args.max_logs,
+        max_log_range=args.max_log_range, seed=args.seed, synthesize_code=args.synthesize_code
+    )
+    app = create_app(
+        chain, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, http_error_rate=args.http_error_rate, seed=args.seed,
+        reject_batches=args.reject_batches
+    )
+    print(f"Mock RPC serving {len(chain.code)} contracts and {len(chain.logs)} logs "
+          f"at http://{args.host}:{args.port} (head {chain.head})", file=sys.stderr)
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == "__main__":
+    main()
@@ -21,5 +21,97 @@ CONFIG = {
         'ethereum': os.getenv('ETH_RPC_URL'),
         'bsc': os.getenv('BSC_RPC_URL'),
         'polygon': os.getenv('POLYGON_RPC_URL'),
+    },
+    'RPC_MOCK': {
+        # Points every chain at a local stand-in node (benchmarks/mock_rpc.py)
+        'URL': os.getenv('MOCK_RPC_URL'),
+    },
+    'CACHE': {
+        'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 10000)),
+        'CODE_TTL': float(os.getenv('CODE_CACHE_TTL', 3600)),
+        'ANALYSIS_TTL': float(os.getenv('ANALYSIS_CACHE_TTL', 86400)),
+    },
+    'SCANNER': {
+        'MAX_SPAN': int(os.getenv('SCANNER_MAX_SPAN', 4096)),
+        'MAX_REPORTED_OFFSETS': int(os.getenv('SCANNER_MAX_REPORTED_OFFSETS', 20)),
+    },
+    'PROCESS_POOL': {
+        'WORKERS': int(os.getenv('ANALYSIS_WORKERS', 0)),
+        'MIN_BYTES': int(os.getenv('ANALYSIS_OFFLOAD_MIN_BYTES', 4096)),
+    },
+    'BATCH': {
+        'MAX_SIZE': int(os.getenv('BATCH_MAX_SIZE', 1000)),
+        'CHAIN_CONCURRENCY': int(os.getenv('BATCH_CHAIN_CONCURRENCY', 8)),
+    },
+    'RPC_CONNECT': {
+        'ON_STARTUP': os.getenv('RPC_CONNECT_ON_STARTUP', 'true').lower() == 'true',
+        'PROBE_TIMEOUT': float(os.getenv('RPC_PROBE_TIMEOUT', 5)),
+    },
+    'RPC_POOL': {
+        'HEALTH_INTERVAL': float(os.getenv('RPC_HEALTH_INTERVAL', 15)),
+        'MAX_ERROR_RATE': float(os.getenv('RPC_MAX_ERROR_RATE', 0.5)),
+        'MAX_BLOCK_LAG': int(os.getenv('RPC_MAX_BLOCK_LAG', 5)),
+    },
+    'RPC_BREAKER': {
+        'REQUEST_TIMEOUT': float(os.getenv('RPC_REQUEST_TIMEOUT', 10)),
+        'FAILURE_THRESHOLD': int(os.getenv('RPC_BREAKER_FAILURE_THRESHOLD', 5)),
+        'RESET_TIMEOUT': float(os.getenv('RPC_BREAKER_RESET_TIMEOUT', 30)),
+    },
+    'RPC_HEDGE': {
+        'ENABLED': os.getenv('RPC_HEDGE_ENABLED', 'false').lower() == 'true',
+        'PERCENTILE': float(os.getenv('RPC_HEDGE_PERCENTILE', 95)),
+        'DEFAULT_DELAY_MS': float(os.getenv('RPC_HEDGE_DEFAULT_DELAY_MS', 100)),
+        'MIN_DELAY_MS': float(os.getenv('RPC_HEDGE_MIN_DELAY_MS', 10)),
+    },
+    'INDEXER': {
+        'LOOKBACK_BLOCKS': int(os.getenv('INDEXER_LOOKBACK_BLOCKS', 10000)),
+        'CONFIRMATIONS': int(os.getenv('INDEXER_CONFIRMATIONS', 12)),
+        'INITIAL_RANGE': int(os.getenv('INDEXER_INITIAL_RANGE', 2000)),
+        'MAX_RANGE': int(os.getenv('INDEXER_MAX_RANGE', 10000)),
+        'RETENTION_BLOCKS': int(os.getenv('INDEXER_RETENTION_BLOCKS', 50000)),
+        'RESULT_LIMIT': int(os.getenv('INDEXER_RESULT_LIMIT', 10000)),
+        'CONCURRENCY_PER_ENDPOINT': int(os.getenv('INDEXER_CONCURRENCY_PER_ENDPOINT', 2)),
+        'MAX_CONTRACTS': int(os.getenv('INDEXER_MAX_CONTRACTS', 10000)),
+        'CHECKPOINT_TTL': float(os.getenv('INDEXER_CHECKPOINT_TTL', 86400)),
+        # Ranges up to this many blocks are screened by header logsBloom before getLogs
+        'BLOOM_MAX_BLOCKS': int(os.getenv('INDEXER_BLOOM_MAX_BLOCKS', 128)),
+        'BLOOM_CACHE_BLOCKS': int(os.getenv('INDEXER_BLOOM_CACHE_BLOCKS', 1024)),
+        'MAX_SPLIT_DEPTH': int(os.getenv('INDEXER_MAX_SPLIT_DEPTH', 6)),
+    },
+    'BEHAVIOR': {
+        'HIGH_VALUE_FACTOR': float(os.getenv('BEHAVIOR_HIGH_VALUE_FACTOR', 10)),
+        'MIN_TRANSFERS': int(os.getenv('BEHAVIOR_MIN_TRANSFERS', 20)),
+        'MAX_TRANSACTIONS': int(os.getenv('BEHAVIOR_MAX_TRANSACTIONS', 2000)),
+        'MIN_TRANSACTIONS': int(os.getenv('BEHAVIOR_MIN_TRANSACTIONS', 30)),
+        'GAS_WINDOW': int(os.getenv('BEHAVIOR_GAS_WINDOW', 100)),
+        'GAS_Z_THRESHOLD': float(os.getenv('BEHAVIOR_GAS_Z_THRESHOLD', 3)),
+        'GAS_FENCE': float(os.getenv('BEHAVIOR_GAS_FENCE', 3)),
+        # Bucket widths of roughly ten minutes at each chain's block time
+        'SPIKE_BUCKET_BLOCKS': {
+            'ethereum': int(os.getenv('ETH_SPIKE_BUCKET_BLOCKS', 50)),
+            'bsc': int(os.getenv('BSC_SPIKE_BUCKET_BLOCKS', 200)),
+            'polygon': int(os.getenv('POLYGON_SPIKE_BUCKET_BLOCKS', 300)),
+        },
+        'SPIKE_BUCKETS': int(os.getenv('BEHAVIOR_SPIKE_BUCKETS', 200)),
+        'SPIKE_THRESHOLD': float(os.getenv('BEHAVIOR_SPIKE_THRESHOLD', 4)),
+        'SPIKE_MIN_EVENTS': int(os.getenv('BEHAVIOR_SPIKE_MIN_EVENTS', 10)),
+    },
+    'METRICS': {
+        'LOOP_LAG_INTERVAL_MS': float(os.getenv('METRICS_LOOP_LAG_INTERVAL_MS', 100)),
+    },
+    'RPC_BATCH': {
+        'MAX_SIZE': int(os.getenv('RPC_BATCH_MAX_SIZE', 50)),
+        'MAX_WAIT_MS': float(os.getenv('RPC_BATCH_MAX_WAIT_MS', 5)),
+    },
+    'WATCHLIST': {
+        'POLL_INTERVAL': float(os.getenv('WATCHLIST_POLL_INTERVAL', 12)),
+        # Watched from startup, as comma-separated chain:address pairs
+        'CONTRACTS': [
+            tuple(item.strip().split(':', 1))
+            for item in os.getenv('WATCHLIST_CONTRACTS', '').split(',') if ':' in item
+        ],
+        'MAX_CONTRACTS': int(os.getenv('WATCHLIST_MAX_CONTRACTS', 1000)),
+        'REFRESH_CONCURRENCY': int(os.getenv('WATCHLIST_REFRESH_CONCURRENCY', 8)),
+        'ADDRESS_CHUNK': int(os.getenv('WATCHLIST_ADDRESS_CHUNK', 100)),
     }
 }
\ No newline at end of file
@@ -0,0 +1,214 @@
+from typing import Dict, Iterable, List, Union
+import binascii
+import numpy as np
+
+PUSH1 = 0x60
+PUSH32 = 0x7f
+
+# Opcodes referenced by detectors and the control-flow graph
+STOP = 0x00
+ORIGIN = 0x32
+TIMESTAMP = 0x42
+NUMBER = 0x43
+SSTORE = 0x55
+JUMP = 0x56
+JUMPI = 0x57
+JUMPDEST = 0x5b
+CALL = 0xf1
+CALLCODE = 0xf2
+DELEGATECALL = 0xf4
+RETURN = 0xf3
+STATICCALL = 0xfa
+REVERT = 0xfd
+INVALID = 0xfe
+SELFDESTRUCT = 0xff
+
+# Instructions after which execution never falls through to the next one
+TERMINATORS = [STOP, JUMP, RETURN, REVERT, INVALID, SELFDESTRUCT]
+
+def is_bytecode(code: str) -> bool:
+    """Whether a code string is hex-encoded bytecode rather than source"""
+    if not code:
+        return False
+    try:
+        to_bytes(code)
+    except ValueError:
+        return False
+    return True
+
+
+def to_bytes(code: Union[str, bytes]) -> bytes:
+    """Decode hex bytecode, with or without 0x; unlike bytes.fromhex, whitespace is rejected"""
+    if isinstance(code, (bytes, bytearray, memoryview)):
+        return bytes(code)
+    return binascii.unhexlify(code[2:] if code.startswith(('0x', '0X')) else code)
+
+
+def strip_metadata(raw: np.ndarray) -> np.ndarray:
+    """Drop the trailing CBOR metadata solc appends, whose hash bytes decode as bogus opcodes"""
+    if len(raw) < 2:
+        return raw
+    length = (int(raw[-2]) << 8) | int(raw[-1])
+    start = len(raw) - 2 - length
+    # solc metadata is a CBOR map (0xa1..0xa5 header) of at most a few hundred bytes
+    if 0 < length <= 256 and start >= 0 and 0xa1 <= raw[start] <= 0xa5:
+        return raw[:start]
+    return raw
+
+
+def instruction_mask(raw: np.ndarray) -> np.ndarray:
+    """Boolean mask of bytes that start an instruction, i.e. are not PUSH immediate data"""
+    size = len(raw)
+    # next_pc[pc] is where execution continues after the instruction at pc; index
+    # `size` is a sentinel that maps to itself
+    next_pc = np.arange(1, size + 2, dtype=np.int64)
+    next_pc[:size] += np.where((raw >= PUSH1) & (raw <= PUSH32), raw.astype(np.int64) - PUSH1 + 1, 0)
+    np.minimum(next_pc, size, out=next_pc)
+
+    # Instruction starts are the orbit of pc 0 under next_pc. Pointer doubling finds
+    # it in log2(size) vectorized steps: after k steps the mask holds next_pc^i(0)
+    # for all i < 2^k, and next_pc has been composed with itself into next_pc^(2^k)
+    mask = np.zeros(size + 1, dtype=bool)
+    mask[0] = True
+    reach = 1
+    while reach < size:
+        mask[next_pc[mask]] = True
+        next_pc = next_pc[next_pc]
+        reach *= 2
+    return mask[:size]
+
+
+class Disassembly:
+    """Runtime bytecode decoded into parallel NumPy arrays of opcodes and program counters"""
+
+    def __init__(self, code: Union[str, bytes]):
+        raw = np.frombuffer(to_bytes(code), dtype=np.uint8)
+        self.raw = strip_metadata(raw)
+        mask = instruction_mask(self.raw)
+        self.pcs = np.flatnonzero(mask)
+        self.opcodes = self.raw[mask]
+        self.opcode_counts = np.bincount(self.opcodes, minlength=256)
+
+    def __len__(self) -> int:
+        return len(self.opcodes)
+
+    def contains(self, opcodes: Iterable[int]) -> bool:
+        return bool(self.opcode_counts[list(opcodes)].any())
+
+    def find(self, opcodes: Iterable[int]) -> np.ndarray:
+        """Program counters of every instruction whose opcode is in the given set"""
+        return self.pcs[np.isin(self.opcodes, list(opcodes))]
+
+    def push_value(self, index: int) -> int:
+        """Immediate value of the PUSH instruction at an instruction index"""
+        pc = int(self.pcs[index])
+        size = int(self.opcodes[index]) - PUSH1 + 1
+        return int.from_bytes(self.raw[pc + 1:pc + 1 + size].tobytes(), 'big')
+
+
+class ControlFlowGraph:
+    """Basic blocks of a disassembly with statically resolved jump edges
+
+    Blocks start at pc 0, at every JUMPDEST and after every JUMP, JUMPI or
+    terminating instruction. A jump whose target is pushed as a constant by the
+    instruction right before it gets an edge if the target is a valid JUMPDEST;
+    dynamic targets (e.g. internal function returns) have no outgoing edge.
+    """
+
+    def __init__(self, disassembly: Disassembly):
+        self.disassembly = disassembly
+        opcodes = disassembly.opcodes
+        pcs = disassembly.pcs
+        count = len(opcodes)
+
+        # Valid jump destinations, indexed by pc
+        self.jumpdest_bitmap = np.zeros(len(disassembly.raw), dtype=bool)
+        self.jumpdest_bitmap[pcs[opcodes == JUMPDEST]] = True
+
+        leaders = opcodes == JUMPDEST
+        if count:
+            leaders[0] = True
+            ends_block = np.isin(opcodes[:-1], TERMINATORS + [JUMPI])
+            leaders[1:] |= ends_block
+
+        # Blocks as [start, end) ranges of instruction indices
+        self.block_starts = np.flatnonzero(leaders)
+        self.block_ends = np.append(self.block_starts[1:], count) if count else self.block_starts
+        self.block_of_instruction = np.cumsum(leaders) - 1
+        self.block_at_pc = np.full(len(disassembly.raw), -1, dtype=np.int64)
+        self.block_at_pc[pcs[self.block_starts]] = np.arange(len(self.block_starts))
+
+        self.successors: List[List[int]] = [[] for _ in range(len(self.block_starts))]
+        for block, end in enumerate(self.block_ends.tolist()):
+            last = end - 1
+            opcode = int(opcodes[last])
+            if opcode in (JUMP, JUMPI):
+                target = self._jump_target(last)
+                if target is not None:
+                    self.successors[block].append(target)
+            if opcode not in TERMINATORS and end < count:
+                self.successors[block].append(block + 1)
+
+    def _jump_target(self, index: int):
+        """Block a jump at an instruction index leads to, if its target is a pushed constant"""
+        if index == 0 or not PUSH1 <= self.disassembly.opcodes[index - 1] <= PUSH32:
+            return None
+        target = self.disassembly.push_value(index - 1)
+        if target >= len(self.jumpdest_bitmap) or not self.jumpdest_bitmap[target]:
+            return None
+        return int(self.block_at_pc[target])
+
+    def __len__(self) -> int:
+        return len(self.block_starts)
+
+    def blocks_reaching(self, opcodes: Iterable[int]) -> np.ndarray:
+        """Mask of blocks from which an instruction in the opcode set is reachable"""
+        contains = np.zeros(len(self), dtype=bool)
+        hits = np.isin(self.disassembly.opcodes, list(opcodes))
+        contains[self.block_of_instruction[hits]] = True
+
+        predecessors = [[] for _ in range(len(self))]
+        for block, successors in enumerate(self.successors):
+            for successor in successors:
+                predecessors[successor].append(block)
+
+        # Reverse breadth-first search from every block containing the opcode
+        reaching = contains.copy()
+        frontier = np.flatnonzero(contains).tolist()
+        while frontier:
+            block = frontier.pop()
+            for predecessor in predecessors[block]:
+                if not reaching[predecessor]:
+                    reaching[predecessor] = True
+                    frontier.append(predecessor)
+        return reaching
+
+    def calls_before_state_write(self) -> np.ndarray:
+        """Program counters of external CALLs followed by an SSTORE on some resolved path"""
+        opcodes = self.disassembly.opcodes
+        call_indices = np.flatnonzero(opcodes == CALL)
+        if not len(call_indices) or not self.disassembly.contains([SSTORE]):
+            return np.array([], dtype=np.int64)
+
+        reaches_sstore = self.blocks_reaching([SSTORE])
+        sstore_indices = np.flatnonzero(opcodes == SSTORE)
+        flagged = []
+        for index in call_indices.tolist():
+            block = int(self.block_of_instruction[index])
+            end = int(self.block_ends[block])
+            # An SSTORE later in the same block, or in any block reachable from here
+            position = np.searchsorted(sstore_indices, index)
+            same_block = position < len(sstore_indices) and sstore_indices[position] < end
+            if same_block or any(reaches_sstore[s] for s in self.successors[block]):
+                flagged.append(int(self.disassembly.pcs[index]))
+        return np.array(flagged, dtype=np.int64)
+
+
+def detect_opcodes(disassembly: Disassembly, detectors: Dict[str, List[int]]) -> Dict[str, np.ndarray]:
+    """Run opcode membership detectors, returning the matching program counters per detector"""
+    matches = {}
+    for name, opcodes in detectors.items():
+        # The opcode histogram rules out most detectors without touching the instruction array
+        if disassembly.contains(opcodes):
+            matches[name] = disassembly.find(opcodes)
+    return matches
@@ -0,0 +1,482 @@
+"""Incremental eth_getLogs indexing of contract activity for behavioral analysis
+
+Each contract keeps a checkpoint of the last block it was indexed to, so a
+repeat analysis only asks the node for blocks mined since. Ranges adapt to
+what the node accepts: a query rejected as too large is bisected (or split
+where the provider suggests), spans grow while pages come back sparse, and
+pages run concurrently within a per-chain budget sized by its endpoints.
+Short incremental ranges whose block headers are already cached, as
+after a watchlist poll, are first screened against their logsBloom
+filters, so getLogs is only sent for blocks that may hold the contract's
+logs.
+"""
+from collections import Counter, OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Union
+import asyncio
+import re
+import numpy as np
+from eth_utils import keccak
+from anomaly import BlockRingCounter
+from cache import TTLCache
+from metrics import LOG_RANGE_SPLITS
+from rpc import RPCError
+
+TRANSFER_TOPIC = '0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef'
+OWNERSHIP_TRANSFERRED_TOPIC = '0x8be0079c531659141344cd1fd0a4f28419497f9722a3daafe3b4186f6b6457e0'
+
+SUGGESTED_RANGE = re.compile(r'\[(0x[0-9a-fA-F]+),\s*(0x[0-9a-fA-F]+)\]')
+BLOCK_RANGE_LIMIT = re.compile(r'(\d+)\s*(k?)\s*-?\s*blocks?\b', re.IGNORECASE)
+RESULT_LIMIT = re.compile(r'more than (\d+) (?:results|logs)', re.IGNORECASE)
+
+
+def bloom_mask(values: Iterable[bytes]) -> int:
+    """Bits a 2048-bit logsBloom has set for every one of these addresses or topics"""
+    mask = 0
+    for value in values:
+        digest = keccak(value)
+        # Three 11-bit indexes from the first six bytes of the hash
+        for i in (0, 2, 4):
+            mask |= 1 << (((digest[i] << 8) | digest[i + 1]) & 2047)
+    return mask
+
+
+def address_mask(address: str) -> int:
+    return bloom_mask([bytes.fromhex(address[2:])])
+
+
+class LogEvent(NamedTuple):
+    """The fields of a log that behavioral detectors use"""
+    block: int
+    topic: Optional[str]
+    sender: Optional[str]
+    receiver: Optional[str]
+    value: Optional[int]
+    transaction_hash: Optional[str]
+
+    @classmethod
+    def from_log(cls, log: Dict) -> 'LogEvent':
+        topics = log.get('topics') or []
+        topic = topics[0].lower() if topics else None
+        sender = receiver = value = None
+        if topic == TRANSFER_TOPIC and len(topics) >= 3:
+            sender = '0x' + topics[1][-40:].lower()
+            receiver = '0x' + topics[2][-40:].lower()
+            # ERC-721 indexes the token id as a fourth topic and has no amount
+            data = log.get('data') or '0x'
+            if len(topics) == 3 and len(data) > 2:
+                value = int(data[:66], 16)
+        return cls(int(log['blockNumber'], 16), topic, sender, receiver, value, log.get('transactionHash'))
+
+
+class BlockColumns:
+    """Per-event columns in block order, appended at the end and trimmed from the front in place"""
+
+    def __init__(self, dtypes: Dict[str, object], capacity: int = 1024):
+        self._columns = {
+            name: np.zeros(capacity, dtype=dtype) for name, dtype in {'block': np.int64, **dtypes}.items()
+        }
+        self._start = self._end = 0
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def column(self, name: str) -> np.ndarray:
+        return self._columns[name][self._start:self._end]
+
+    def extend(self, blocks: List[int], **values):
+        if not blocks:
+            return
+        size = len(self)
+        if self._end + len(blocks) > len(self._columns['block']):
+            # Compact to the front, doubling only when the live window itself needs the room
+            capacity = max(len(self._columns['block']), 2 * (size + len(blocks)))
+            for name, old in self._columns.items():
+                new = np.zeros(capacity, dtype=old.dtype)
+                new[:size] = old[self._start:self._end]
+                self._columns[name] = new
+            self._start, self._end = 0, size
+        end = self._end + len(blocks)
+        self._columns['block'][self._end:end] = blocks
+        for name, column in values.items():
+            self._columns[name][self._end:end] = column
+        self._end = end
+
+    def prune(self, oldest_block: int) -> Dict[str, np.ndarray]:
+        """Drop rows of blocks before oldest_block, returning them"""
+        dropped = int(np.searchsorted(self.column('block'), oldest_block))
+        rows = {name: column[self._start:self._start + dropped].copy() for name, column in self._columns.items()}
+        self._start += dropped
+        return rows
+
+
+class TransferAmounts(BlockColumns):
+    """Transfer amounts in block order, as floats for comparison plus their exact 32 bytes"""
+
+    def __init__(self, capacity: int = 1024):
+        # uint256 amounts overflow int64; float64 keeps their magnitude, which is all that's compared
+        super().__init__({'value': np.float64, 'exact': 'V32'}, capacity)
+
+    @property
+    def values(self) -> np.ndarray:
+        return self.column('value')
+
+    def exact(self, index: int) -> int:
+        """An amount float64 can't represent, for reporting"""
+        return int.from_bytes(self.column('exact')[index].tobytes(), 'big')
+
+    def extend(self, blocks: List[int], amounts: List[int]):
+        super().extend(
+            blocks, value=[float(amount) for amount in amounts],
+            exact=[amount.to_bytes(32, 'big') for amount in amounts]
+        )
+
+
+class ContractActivity:
+    """Indexed events of one contract within the retention window, and its checkpoint
+
+    Topic, counterparty and transfer-amount aggregates are kept up to date as
+    events are added and pruned, so detectors never rescan the whole window.
+    Events themselves are only kept as fixed-width columns, enough to retire
+    them from the aggregates once they leave the window.
+    """
+
+    def __init__(self, bucket_blocks: int = 50, buckets: int = 200, max_transactions: int = 2000):
+        self.checkpoint: Optional[int] = None
+        self.first_block: Optional[int] = None
+        self.range_size: Optional[int] = None
+        self.max_transactions = max_transactions
+        # Topic of every event, as an index into the contract's few distinct topics
+        self.events = BlockColumns({'topic': np.int32})
+        self._topics: List[Optional[str]] = []
+        self._topic_ids: Dict[Optional[str], int] = {}
+        # Raw 20-byte counterparties of every transfer
+        self.transfers = BlockColumns({'sender': 'V20', 'receiver': 'V20'})
+        # Latest distinct transaction hash -> block, newest last; older ones have no use
+        self.transactions: OrderedDict = OrderedDict()
+        # Transaction hash -> (block, gas used, effective gas price) of confirmed receipts
+        self.receipts: Dict[str, Tuple[int, int, int]] = {}
+        # Events per block bucket, updated as pages are committed
+        self.activity_counts = BlockRingCounter(bucket_blocks, buckets)
+        self.topic_counts = Counter()
+        self.senders = Counter()
+        self.receivers = Counter()
+        self.transfer_amounts = TransferAmounts()
+        self.lock = asyncio.Lock()
+
+    def add(self, logs: List[Dict]):
+        events = [LogEvent.from_log(log) for log in logs if not log.get('removed')]
+        self.events.extend([event.block for event in events], topic=[self._topic_id(event.topic) for event in events])
+        self.activity_counts.add_blocks([event.block for event in events])
+        self.topic_counts.update(event.topic for event in events)
+        transfers = [event for event in events if event.topic == TRANSFER_TOPIC]
+        self.transfers.extend(
+            [event.block for event in transfers],
+            sender=[bytes.fromhex(event.sender[2:]) for event in transfers],
+            receiver=[bytes.fromhex(event.receiver[2:]) for event in transfers]
+        )
+        self.senders.update(event.sender for event in transfers)
+        self.receivers.update(event.receiver for event in transfers)
+        amounts = [event for event in transfers if event.value is not None]
+        self.transfer_amounts.extend([event.block for event in amounts], [event.value for event in amounts])
+        for event in events:
+            if event.transaction_hash:
+                self.transactions.pop(event.transaction_hash, None)
+                self.transactions[event.transaction_hash] = event.block
+        while len(self.transactions) > self.max_transactions:
+            transaction_hash, _ = self.transactions.popitem(last=False)
+            self.receipts.pop(transaction_hash, None)
+
+    def prune(self, oldest_block: int):
+        """Drop events older than the retention window"""
+        topic_ids = self.events.prune(oldest_block)['topic']
+        for topic_id, count in enumerate(np.bincount(topic_ids)):
+            if count:
+                self._forget(self.topic_counts, self._topics[topic_id], int(count))
+        transfers = self.transfers.prune(oldest_block)
+        for counts, column in ((self.senders, 'sender'), (self.receivers, 'receiver')):
+            for address, count in Counter(value.tobytes() for value in transfers[column]).items():
+                self._forget(counts, '0x' + address.hex(), count)
+        self.transfer_amounts.prune(oldest_block)
+        while self.transactions and next(iter(self.transactions.values())) < oldest_block:
+            self.transactions.popitem(last=False)
+        for transaction_hash in [h for h, receipt in self.receipts.items() if receipt[0] < oldest_block]:
+            del self.receipts[transaction_hash]
+        if self.first_block is not None:
+            self.first_block = max(self.first_block, oldest_block)
+
+    def _topic_id(self, topic: Optional[str]) -> int:
+        topic_id = self._topic_ids.get(topic)
+        if topic_id is None:
+            topic_id = self._topic_ids[topic] = len(self._topics)
+            self._topics.append(topic)
+        return topic_id
+
+    @property
+    def block_span(self) -> int:
+        if self.checkpoint is None or self.first_block is None:
+            return 0
+        return self.checkpoint - self.first_block + 1
+
+    @staticmethod
+    def _forget(counts: Counter, key, count: int = 1):
+        counts[key] -= count
+        if counts[key] <= 0:
+            del counts[key]
+
+    def recent_transactions(self, limit: int) -> List[str]:
+        """Hashes of the latest distinct transactions that emitted an indexed event"""
+        hashes = []
+        for transaction_hash in reversed(self.transactions):
+            if len(hashes) >= limit:
+                break
+            hashes.append(transaction_hash)
+        return hashes
+
+    def gas_arrays(self, transactions: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Block number, gas used and gas price of the given transactions as arrays"""
+        rows = [self.receipts[h] for h in transactions if h in self.receipts]
+        if not rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0)
+        table = np.array(rows, dtype=np.float64)
+        return table[:, 0].astype(np.int64), table[:, 1], table[:, 2]
+
+
+class LogIndexer:
+    """Per-contract log checkpoints, advanced by fetching only new confirmed blocks"""
+
+    def __init__(self, request: Callable[[str, str, List], Awaitable], lookback_blocks: int = 10000,
+                 confirmations: int = 12, initial_range: int = 2000, max_range: int = 10000,
+                 retention_blocks: int = 50000, max_contracts: int = 10000,
+                 checkpoint_ttl: float = 86400.0, result_limit: int = 10000,
+                 concurrency: Callable[[str], int] = lambda chain: 4,
+                 bucket_blocks: Callable[[str], int] = lambda chain: 50, buckets: int = 200,
+                 bloom_max_blocks: int = 128, bloom_cache_blocks: int = 1024, max_split_depth: int = 6,
+                 max_transactions: int = 2000):
+        self.request = request
+        self.lookback_blocks = lookback_blocks
+        self.confirmations = confirmations
+        self.initial_range = initial_range
+        self.max_range = max_range
+        self.retention_blocks = retention_blocks
+        self.result_limit = result_limit
+        self.concurrency = concurrency
+        self.bucket_blocks = bucket_blocks
+        self.buckets = buckets
+        self.bloom_max_blocks = bloom_max_blocks
+        self.bloom_cache_blocks = bloom_cache_blocks
+        self.max_split_depth = max_split_depth
+        self.max_transactions = max_transactions
+        self._activity = TTLCache(max_contracts, checkpoint_ttl)
+        # Shared by every contract on a chain, so parallel scans can't swamp its endpoints
+        self._budgets: Dict[str, asyncio.Semaphore] = {}
+        # Largest block span each chain's provider has accepted, once it has rejected one
+        self._range_caps: Dict[str, int] = {}
+        # Recent block -> logsBloom per chain; None means the header had no bloom to test
+        self._blooms: Dict[str, OrderedDict] = {}
+        self._header_locks: Dict[str, asyncio.Lock] = {}
+
+    async def update(self, chain: str, address: str, head: int) -> ContractActivity:
+        """Index a contract's logs up to the latest confirmed block and return its activity"""
+        key = (chain, address.lower())
+        activity = self._activity.get(key)
+        if activity is None:
+            activity = ContractActivity(self.bucket_blocks(chain), self.buckets, self.max_transactions)
+        # Refresh the TTL on every use so active contracts keep their checkpoint
+        self._activity.set(key, activity)
+
+        async with activity.lock:
+            # Blocks this close to the head may still be reorged away
+            safe_head = head - self.confirmations
+            if activity.checkpoint is None:
+                activity.first_block = max(0, safe_head - self.lookback_blocks + 1)
+                activity.checkpoint = activity.first_block - 1
+                activity.activity_counts.advance(activity.first_block)
+            if activity.checkpoint < safe_head:
+                await self._fetch(chain, address, activity.checkpoint + 1, safe_head, activity)
+            # Quiet stretches count as empty buckets rather than missing ones
+            activity.activity_counts.advance(activity.checkpoint)
+            activity.prune(safe_head - self.retention_blocks + 1)
+        return activity
+
+    async def _fetch(self, chain: str, address: str, start: int, end: int, activity: ContractActivity):
+        """Fetch [start, end] in waves of concurrent pages, committing them in block order"""
+        if end - start + 1 <= self.bloom_max_blocks and self._blooms_cached(chain, start, end):
+            # Headers another caller (e.g. a watchlist poll) already fetched cost nothing to screen;
+            # fetching them here would be a call per block instead of one getLogs
+            span = await self.bloom_span(chain, address_mask(address), start, end)
+            if span is not None:
+                for _, _, logs in await self._fetch_page(chain, address, *span):
+                    activity.add(logs)
+            activity.checkpoint = end
+            return
+
+        span = min(activity.range_size or self.initial_range, self._range_cap(chain))
+        width = self.concurrency(chain)
+        block = start
+        while block <= end:
+            pages = []
+            while block <= end and len(pages) < width:
+                pages.append((block, min(end, block + span - 1)))
+                block = pages[-1][1] + 1
+            results = await asyncio.gather(
+                *(self._fetch_page(chain, address, a, b) for a, b in pages), return_exceptions=True
+            )
+
+            # Commit the contiguous prefix, so the checkpoint never skips a failed page
+            leaves = []
+            for (a, b), result in zip(pages, results):
+                if isinstance(result, BaseException):
+                    activity.range_size = span
+                    raise result
+                leaves.extend(result)
+                for _, leaf_end, logs in result:
+                    activity.add(logs)
+                    activity.checkpoint = leaf_end
+
+            span = self._next_span(chain, span, leaves, split=len(leaves) > len(pages))
+        activity.range_size = span
+
+    async def fetch_logs(self, chain: str, addresses: Union[str, List[str]], start: int, end: int) -> List[Dict]:
+        """Logs of one or more contracts over a block range, split as the provider requires"""
+        leaves = await self._fetch_page(chain, addresses, start, end)
+        return [log for _, _, logs in leaves for log in logs]
+
+    async def _fetch_page(self, chain: str, address: Union[str, List[str]], start: int,
+                          end: int, depth: int = 0) -> List[Tuple[int, int, List]]:
+        """One getLogs call, bisected into concurrent sub-ranges until the node accepts each"""
+        budget = self._budgets.get(chain)
+        if budget is None:
+            budget = self._budgets[chain] = asyncio.Semaphore(self.concurrency(chain))
+        try:
+            # Held only for the call, so sub-ranges below can take their own slots
+            async with budget:
+                logs = await self.request(chain, 'eth_getLogs', [{
+                    'address': address, 'fromBlock': hex(start), 'toBlock': hex(end)
+                }])
+        except (RPCError, asyncio.TimeoutError) as e:
+            if start == end or not self._is_range_error(e):
+                raise
+            ranges, guided = self._split(chain, start, end, e)
+            # Blind bisection is capped, so an error misread as range-related can't fan out
+            # into thousands of calls; ranges the provider suggested don't count towards it
+            if not guided and depth >= self.max_split_depth:
+                raise
+            LOG_RANGE_SPLITS.inc(chain=chain)
+            parts = await asyncio.gather(
+                *(self._fetch_page(chain, address, a, b, depth + (not guided)) for a, b in ranges),
+                return_exceptions=True
+            )
+            leaves = []
+            for part in parts:
+                if isinstance(part, BaseException):
+                    raise part
+                leaves.extend(part)
+            return leaves
+        return [(start, end, logs)]
+
+    async def bloom_span(self, chain: str, mask: int, start: int, end: int) -> Optional[Tuple[int, int]]:
+        """First and last block in [start, end] whose header bloom may contain every bit of the mask"""
+        blooms = await self._header_blooms(chain, start, end)
+        passing = [block for block, bloom in blooms.items() if bloom is None or bloom & mask == mask]
+        # One getLogs over the passing blocks beats one per block; the node skips the rest itself
+        return (min(passing), max(passing)) if passing else None
+
+    async def bloom_candidates(self, chain: str, addresses: List[str], start: int, end: int) -> Set[str]:
+        """Addresses that may have emitted logs in [start, end], by header blooms alone"""
+        blooms = await self._header_blooms(chain, start, end)
+        masks = {address: address_mask(address) for address in addresses}
+        candidates = set()
+        for bloom in blooms.values():
+            if bloom is None:
+                return set(addresses)
+            candidates.update(address for address, mask in masks.items() if bloom & mask == mask)
+        return candidates
+
+    def _blooms_cached(self, chain: str, start: int, end: int) -> bool:
+        cache = self._blooms.get(chain)
+        return cache is not None and all(block in cache for block in range(start, end + 1))
+
+    async def _header_blooms(self, chain: str, start: int, end: int) -> Dict[int, Optional[int]]:
+        """logsBloom of each block in [start, end], fetching only headers not already cached"""
+        cache = self._blooms.setdefault(chain, OrderedDict())
+        # Contracts refreshed together wait for one header fetch instead of each sending their own
+        async with self._header_locks.setdefault(chain, asyncio.Lock()):
+            missing = [block for block in range(start, end + 1) if block not in cache]
+            # Concurrent calls are coalesced into JSON-RPC batches by the endpoint's batcher
+            headers = await asyncio.gather(
+                *(self.request(chain, 'eth_getBlockByNumber', [hex(block), False]) for block in missing)
+            )
+            blooms = {block: cache[block] for block in range(start, end + 1) if block in cache}
+            for block, header in zip(missing, headers):
+                bloom = (header or {}).get('logsBloom')
+                blooms[block] = int(bloom, 16) if bloom else None
+                # A node that hasn't seen the block yet may have it on the next call
+                if header:
+                    cache[block] = blooms[block]
+            while len(cache) > self.bloom_cache_blocks:
+                cache.popitem(last=False)
+            return blooms
+
+    async def update_receipts(self, chain: str, activity: ContractActivity, transactions: List[str],
+                              chunk_size: int = 500):
+        """Fetch receipts not seen before; they're immutable once confirmed, so each is fetched once"""
+        async with activity.lock:
+            missing = [h for h in transactions if h not in activity.receipts]
+            for offset in range(0, len(missing), chunk_size):
+                chunk = missing[offset:offset + chunk_size]
+                # Concurrent calls are coalesced into JSON-RPC batches by the endpoint's batcher
+                receipts = await asyncio.gather(
+                    *(self.request(chain, 'eth_getTransactionReceipt', [h]) for h in chunk)
+                )
+                for transaction_hash, receipt in zip(chunk, receipts):
+                    if not receipt:
+                        continue
+                    # Pre-London receipts have no effectiveGasPrice
+                    gas_price = receipt.get('effectiveGasPrice') or receipt.get('gasPrice') or '0x0'
+                    activity.receipts[transaction_hash] = (
+                        int(receipt['blockNumber'], 16), int(receipt['gasUsed'], 16), int(gas_price, 16)
+                    )
+
+    def _split(self, chain: str, start: int, end: int, error: Exception) -> Tuple[List[Tuple[int, int]], bool]:
+        """Sub-ranges to retry, and whether they follow a limit or range the provider suggested"""
+        message = str(error)
+        suggested = SUGGESTED_RANGE.search(message)
+        if suggested:
+            # e.g. Infura: "query returned more than 10000 results. Try with this block range [0x.., 0x..]"
+            split_at = int(suggested.group(2), 16)
+            if start <= split_at < end:
+                return [(start, split_at), (split_at + 1, end)], True
+
+        cap = BLOCK_RANGE_LIMIT.search(message)
+        if cap:
+            # e.g. "block range is too wide, max is 2000 blocks"; later pages start within it
+            limit = int(cap.group(1)) * (1000 if cap.group(2) else 1)
+            if 0 < limit < end - start + 1:
+                self._range_caps[chain] = min(self._range_cap(chain), limit)
+                return [(a, min(end, a + limit - 1)) for a in range(start, end + 1, limit)], True
+
+        results = RESULT_LIMIT.search(message)
+        if results:
+            self.result_limit = int(results.group(1))
+
+        middle = (start + end) // 2
+        return [(start, middle), (middle + 1, end)], False
+
+    def _next_span(self, chain: str, span: int, leaves: List[Tuple[int, int, List]], split: bool) -> int:
+        """Shrink to what the node accepted after a split, double while pages come back sparse"""
+        if split:
+            widths = sorted(leaf_end - leaf_start + 1 for leaf_start, leaf_end, _ in leaves)
+            span = widths[len(widths) // 2]
+        elif max(len(logs) for _, _, logs in leaves) < self.result_limit // 4:
+            span *= 2
+        return max(1, min(span, self.max_range, self._range_cap(chain)))
+
+    def _range_cap(self, chain: str) -> int:
+        return self._range_caps.get(chain, self.max_range)
+
+    @staticmethod
+    def _is_range_error(error: Exception) -> bool:
+        """Whether a smaller block range might succeed where this one failed"""
+        if isinstance(error, asyncio.TimeoutError):
+            return True
+        return isinstance(error, RPCError) and error.range_limited
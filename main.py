@@ -5,13 +5,45 @@ from pathlib import Path
 project_dir = Path(__file__).parent
 sys.path.append(str(project_dir))
 
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+import asyncio
+import json
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 import uvicorn
 from model import EnhancedSecurityAnalyzer
+from watchlist import Watchlist
+from config import CONFIG
+import metrics
 
-app = FastAPI(title="Smart Contract Security Analyzer")
 analyzer = EnhancedSecurityAnalyzer()
+watchlist = Watchlist(
+    analyzer,
+    poll_interval=CONFIG['WATCHLIST']['POLL_INTERVAL'],
+    max_contracts=CONFIG['WATCHLIST']['MAX_CONTRACTS'],
+    refresh_concurrency=CONFIG['WATCHLIST']['REFRESH_CONCURRENCY'],
+    address_chunk=CONFIG['WATCHLIST']['ADDRESS_CHUNK']
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Chains that are not warmed here are connected lazily on their first request
+    if CONFIG['RPC_CONNECT']['ON_STARTUP']:
+        await analyzer.initialize()
+    # Worker processes take seconds to spawn, which the first large contract would otherwise pay
+    await analyzer.start_workers()
+    lag_monitor = asyncio.ensure_future(
+        metrics.monitor_event_loop_lag(CONFIG['METRICS']['LOOP_LAG_INTERVAL_MS'] / 1000)
+    )
+    # Each add is a full analysis, so a long list is worked through after startup
+    watchlist.start(CONFIG['WATCHLIST']['CONTRACTS'])
+    yield
+    lag_monitor.cancel()
+    await watchlist.close()
+    await analyzer.close()
+
+app = FastAPI(title="Smart Contract Security Analyzer", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -32,13 +64,101 @@ async def analyze_contract(data: dict):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/security/analyze/stream")
+async def analyze_contract_stream(data: dict, request: Request):
+    # Server-sent events when the client asks for them, newline-delimited JSON otherwise
+    if 'contract' not in data or 'chain' not in data:
+        raise HTTPException(status_code=400, detail="'contract' and 'chain' are required")
+    sse = 'text/event-stream' in request.headers.get('accept', '')
+
+    async def events():
+        async for event in analyzer.analyze_contract_stream(data['contract'], data['chain']):
+            payload = json.dumps(event, default=str)
+            if sse:
+                yield f"event: {event.get('stage', 'error')}\ndata: {payload}\n\n"
+            else:
+                yield payload + "\n"
+
+    return StreamingResponse(
+        events(),
+        media_type='text/event-stream' if sse else 'application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.post("/api/security/analyze/batch")
+async def analyze_contracts_batch(data: dict):
+    contracts = data.get('contracts')
+    if not isinstance(contracts, list) or not contracts:
+        raise HTTPException(status_code=400, detail="'contracts' must be a non-empty list")
+    if len(contracts) > CONFIG['BATCH']['MAX_SIZE']:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch size exceeds limit of {CONFIG['BATCH']['MAX_SIZE']} contracts"
+        )
+    try:
+        results = await analyzer.analyze_batch(contracts)
+        return {'results': results, 'count': len(results)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def threat_intel_response(snapshot, request: Request, cache_control: str) -> Response:
+    # The body is serialized once per snapshot; revalidation skips even sending it
+    headers = {'ETag': snapshot.etag, 'Cache-Control': cache_control}
+    if snapshot.matches(request.headers.get('if-none-match')):
+        return Response(status_code=304, headers=headers)
+    return Response(snapshot.body, media_type='application/json', headers=headers)
+
 @app.get("/api/security/threats")
-async def get_threats():
+async def get_threats(request: Request):
+    return threat_intel_response(analyzer.threat_intel.current, request, 'no-cache')
+
+@app.get("/api/security/threats/{version}")
+async def get_threats_version(version: str, request: Request):
+    # A version's content never changes, so clients may cache it indefinitely
+    snapshot = analyzer.threat_intel.get(version)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired threat intelligence version")
+    return threat_intel_response(snapshot, request, 'public, max-age=31536000, immutable')
+
+@app.post("/api/watchlist")
+async def add_to_watchlist(data: dict):
+    if 'contract' not in data or 'chain' not in data:
+        raise HTTPException(status_code=400, detail="'contract' and 'chain' are required")
     try:
-        threats = await analyzer._get_threat_intelligence()
-        return threats
+        return await watchlist.add(data['chain'], data['contract'])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/watchlist")
+async def get_watchlist():
+    scores = watchlist.scores()
+    return {'contracts': scores, 'count': len(scores)}
+
+@app.get("/api/watchlist/{chain}/{contract}")
+async def get_watched_contract(chain: str, contract: str):
+    try:
+        entry = watchlist.get(chain, contract)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Contract is not watched")
+    return entry
+
+@app.delete("/api/watchlist/{chain}/{contract}")
+async def remove_from_watchlist(chain: str, contract: str):
+    try:
+        removed = watchlist.remove(chain, contract)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not removed:
+        raise HTTPException(status_code=404, detail="Contract is not watched")
+    return {'removed': True}
+
+@app.get("/metrics")
+async def get_metrics():
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,215 @@
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+import asyncio
+import math
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """A named metric family with a fixed set of label names"""
+
+    type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _label_text(self, key: Tuple[str, ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{self._label_text(key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {_escape(self.documentation)}",
+            f"# TYPE {self.name} {self.type}",
+            *self.samples()
+        ]
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+
+    type = 'counter'
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set_total(self, value: float, **labels):
+        """Copy in a running total kept elsewhere, e.g. by a collector at scrape time"""
+        self._values[self._key(labels)] = value
+
+
+class Gauge(Metric):
+    """Point-in-time value"""
+
+    type = 'gauge'
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, with their sum and count"""
+
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+        counts = state[0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        state[1] += value
+        state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of a block, including when it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = self._label_text(key, (('le', _format_value(bound)),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {count}")
+        return lines
+
+
+class Registry:
+    """Metric families rendered together in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]):
+        """Register a callback that refreshes gauges right before each scrape"""
+        self._collectors.append(collector)
+
+    def remove_collector(self, collector: Callable[[], None]):
+        if collector in self._collectors:
+            self._collectors.remove(collector)
+
+    def render(self) -> str:
+        for collector in list(self._collectors):
+            try:
+                collector()
+            except Exception as e:
+                print(f"Warning: Metrics collector failed: {e}")
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+async def monitor_event_loop_lag(interval: float = 0.1):
+    """Observe how late the loop wakes from a fixed sleep, which is time stolen by blocking work"""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, time.perf_counter() - started - interval))
+
+
+REGISTRY = Registry()
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+STAGE_DURATION = REGISTRY.register(Histogram(
+    'netpack_stage_duration_seconds',
+    'Time spent in each analyzer stage',
+    ['stage']
+))
+
+RPC_REQUEST_DURATION = REGISTRY.register(Histogram(
+    'netpack_rpc_request_duration_seconds',
+    'RPC call latency by chain, endpoint host, method and outcome',
+    ['chain', 'endpoint', 'method', 'outcome']
+))
+
+RPC_RETRIES = REGISTRY.register(Counter(
+    'netpack_rpc_retries_total',
+    'RPC calls sent to another endpoint after a failure (failover) or a slow primary (hedge)',
+    ['chain', 'method', 'reason']
+))
+
+CACHE_HIT_RATIO = REGISTRY.register(Gauge(
+    'netpack_cache_hit_ratio',
+    'Fraction of cache lookups served from the cache since startup',
+    ['cache']
+))
+
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    'netpack_cache_lookups_total',
+    'Cache lookups since startup by result',
+    ['cache', 'result']
+))
+
+CACHE_ENTRIES = REGISTRY.register(Gauge(
+    'netpack_cache_entries',
+    'Entries currently held in each cache',
+    ['cache']
+))
+
+EVENT_LOOP_LAG = REGISTRY.register(Histogram(
+    'netpack_event_loop_lag_seconds',
+    'Delay between a scheduled event loop wake-up and when it ran',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+))
+
+LOG_RANGE_SPLITS = REGISTRY.register(Counter(
+    'netpack_log_range_splits_total',
+    'eth_getLogs ranges split after the provider rejected them as too large',
+    ['chain']
+))
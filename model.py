@@ -1,11 +1,22 @@
-from typing import Dict, List, Union, Optional
+from typing import AsyncIterator, Awaitable, Dict, List, Tuple, Union, Optional
 import numpy as np
 from web3 import Web3
 import httpx
 import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
-import re
 from config import CONFIG
+from cache import TTLCache
+from rpc import EndpointPool
+from metrics import REGISTRY, STAGE_DURATION, CACHE_HIT_RATIO, CACHE_LOOKUPS, CACHE_ENTRIES
+import evm
+import workers
+from indexer import LogIndexer, OWNERSHIP_TRANSFERRED_TOPIC
+from anomaly import gas_anomalies, detect_spikes
+from threat_intel import ThreatIntelStore
 
 class ContractValidationError(Exception):
     """Custom exception for contract validation errors"""
@@ -14,24 +25,8 @@ class ContractValidationError(Exception):
 class EnhancedSecurityAnalyzer:
     def __init__(self):
         """Initialize the security analyzer with pattern-based analysis"""
-        # Initialize Web3 connections with fallback endpoints
-        self.web3_connections = {}
-        self._initialize_web3_connections()
-        
-        # vulnerability patterns
-        self.vulnerability_patterns = {
-            'reentrancy': r'(\.\bcall\b.*?{.*?[\w\.]+\.transfer\()',
-            'overflow': r'(\+|\-|\*|\/(?!/))(?![^{]*})(?![^\[]*\])',
-            'timestamp_dependency': r'\b(block\.(timestamp|number)|now)\b',
-            'unchecked_external_call': r'\.call\{.*?\}',
-            'arbitrary_jump': r'\bassembly\b.*?\bjump\b',
-            'delegatecall': r'\.delegatecall\(',
-            'self_destruct': r'\bselfdestruct\b|\bsuicide\b'
-        }
-
-    def _initialize_web3_connections(self):
-        """Initialize Web3 connections with fallback endpoints"""
-        endpoints = {
+        # Web3 connections are opened per chain on first use or by initialize()
+        self.rpc_endpoints = {
             'ethereum': [
                 'https://mainnet.infura.io/v3/38560066c01e42d39bdfcef279e3d4cb',
                 'https://eth-mainnet.g.alchemy.com/v2/EfdTDiOjk9sfEF4RIxxGFLc7NGD7CKhq',
@@ -46,52 +41,193 @@ class EnhancedSecurityAnalyzer:
                 'https://rpc-mainnet.matic.network'
             ]
         }
+        # Comma-separated URLs in the environment replace the defaults for a chain
+        for chain, urls in CONFIG['RPC'].items():
+            if urls:
+                self.rpc_endpoints[chain] = [url.strip() for url in urls.split(',') if url.strip()]
+        if CONFIG['RPC_MOCK']['URL']:
+            self.rpc_endpoints = {chain: [CONFIG['RPC_MOCK']['URL']] for chain in self.rpc_endpoints}
+        self.rpc_pools = {}
+        self.startup_time = None
+        self._chain_locks = {}
+        
+        # Deployed code is immutable, so code and detector results are cached by code hash
+        cache_config = CONFIG['CACHE']
+        self.code_hash_cache = TTLCache(cache_config['MAX_ENTRIES'], cache_config['CODE_TTL'])
+        self.code_cache = TTLCache(cache_config['MAX_ENTRIES'], cache_config['CODE_TTL'])
+        self.analysis_cache = TTLCache(cache_config['MAX_ENTRIES'], cache_config['ANALYSIS_TTL'])
+        REGISTRY.add_collector(self._collect_cache_metrics)
+        
+        # Per-chain limits for batch analysis, created on first use
+        self._chain_limits = {}
+        
+        # Analyses currently running, keyed by (chain, checksum address)
+        self._in_flight = {}
+        
+        # Worker processes for CPU-bound detectors, started by start_workers() or on first use
+        self._process_pool = None
+        
+        # Contract logs indexed incrementally from a per-contract checkpoint
+        indexer_config = CONFIG['INDEXER']
+        self.log_indexer = LogIndexer(
+            self._rpc_request,
+            lookback_blocks=indexer_config['LOOKBACK_BLOCKS'],
+            confirmations=indexer_config['CONFIRMATIONS'],
+            initial_range=indexer_config['INITIAL_RANGE'],
+            max_range=indexer_config['MAX_RANGE'],
+            retention_blocks=indexer_config['RETENTION_BLOCKS'],
+            result_limit=indexer_config['RESULT_LIMIT'],
+            concurrency=lambda chain: indexer_config['CONCURRENCY_PER_ENDPOINT'] * len(self.rpc_endpoints[chain]),
+            bucket_blocks=lambda chain: CONFIG['BEHAVIOR']['SPIKE_BUCKET_BLOCKS'].get(chain, 50),
+            buckets=CONFIG['BEHAVIOR']['SPIKE_BUCKETS'],
+            max_contracts=indexer_config['MAX_CONTRACTS'],
+            checkpoint_ttl=indexer_config['CHECKPOINT_TTL'],
+            bloom_max_blocks=indexer_config['BLOOM_MAX_BLOCKS'],
+            bloom_cache_blocks=indexer_config['BLOOM_CACHE_BLOCKS'],
+            max_split_depth=indexer_config['MAX_SPLIT_DEPTH'],
+            max_transactions=CONFIG['BEHAVIOR']['MAX_TRANSACTIONS']
+        )
+        
+        # vulnerability patterns
+        self.vulnerability_patterns = {
+            # Same matches as `.*?{.*?[\w\.]+`, without the nested lazy backtracking
+            'reentrancy': r'(\.\bcall\b[^{\n]*{.*?[\w\.]\.transfer\()',
+            'overflow': r'(\+|\-|\*|\/(?!/))(?![^{]*})(?![^\[]*\])',
+            'timestamp_dependency': r'\b(block\.(timestamp|number)|now)\b',
+            'unchecked_external_call': r'\.call\{.*?\}',
+            'arbitrary_jump': r'\bassembly\b.*?\bjump\b',
+            'delegatecall': r'\.delegatecall\(',
+            'self_destruct': r'\bselfdestruct\b|\bsuicide\b'
+        }
+        
+        # Opcode detectors for deployed runtime bytecode
+        self.opcode_detectors = {
+            'delegatecall': [evm.DELEGATECALL],
+            'self_destruct': [evm.SELFDESTRUCT],
+            'callcode': [evm.CALLCODE],
+            'timestamp_dependency': [evm.TIMESTAMP, evm.NUMBER],
+            'tx_origin': [evm.ORIGIN]
+        }
+        # Opcodes reported for context only; almost every contract makes external calls
+        self.opcode_observations = {
+            'external_call': [evm.CALL]
+        }
+        
+        # Serialized once; results cite the snapshot version rather than copying it
+        self.threat_intel = ThreatIntelStore(self._threat_intelligence_data())
+
+    async def initialize(self) -> float:
+        """Probe all chains concurrently and return the elapsed time in seconds"""
+        started = time.perf_counter()
+        connected = await asyncio.gather(
+            *(self._ensure_connection(chain) for chain in self.rpc_endpoints)
+        )
+        self.startup_time = time.perf_counter() - started
+        print(
+            f"Connected to {sum(connected)}/{len(self.rpc_endpoints)} chains "
+            f"in {self.startup_time:.2f}s"
+        )
+        return self.startup_time
+
+    async def _ensure_connection(self, chain: str) -> bool:
+        """Open the endpoint pool for a chain on first use and report its health"""
+        if chain in self.rpc_pools:
+            return self.rpc_pools[chain].healthy
+        if chain not in self.rpc_endpoints:
+            return False
         
-        for network, urls in endpoints.items():
-            for url in urls:
-                try:
-                    web3 = Web3(Web3.HTTPProvider(url))
-                    if web3.is_connected():
-                        self.web3_connections[network] = web3
-                        break
-                except Exception as e:
-                    continue
-            if network not in self.web3_connections:
-                print(f"Warning: Could not connect to {network}")
+        lock = self._chain_locks.setdefault(chain, asyncio.Lock())
+        async with lock:
+            if chain not in self.rpc_pools:
+                pool = self._create_pool(chain)
+                await pool.check_health()
+                # Unhealthy pools stay registered; the background loop brings them back
+                pool.start()
+                self.rpc_pools[chain] = pool
+                if not pool.healthy:
+                    print(f"Warning: Could not connect to {chain}")
+        return self.rpc_pools[chain].healthy
+
+    def _create_pool(self, chain: str) -> EndpointPool:
+        """Create the endpoint pool used for a chain's RPC calls"""
+        pool_config = CONFIG['RPC_POOL']
+        batch_config = CONFIG['RPC_BATCH']
+        hedge_config = CONFIG['RPC_HEDGE']
+        breaker_config = CONFIG['RPC_BREAKER']
+        return EndpointPool(
+            chain,
+            self.rpc_endpoints[chain],
+            probe_timeout=CONFIG['RPC_CONNECT']['PROBE_TIMEOUT'],
+            health_interval=pool_config['HEALTH_INTERVAL'],
+            max_error_rate=pool_config['MAX_ERROR_RATE'],
+            max_block_lag=pool_config['MAX_BLOCK_LAG'],
+            max_batch_size=batch_config['MAX_SIZE'],
+            max_wait=batch_config['MAX_WAIT_MS'] / 1000,
+            request_timeout=breaker_config['REQUEST_TIMEOUT'],
+            failure_threshold=breaker_config['FAILURE_THRESHOLD'],
+            reset_timeout=breaker_config['RESET_TIMEOUT'],
+            hedge=hedge_config['ENABLED'],
+            hedge_percentile=hedge_config['PERCENTILE'],
+            hedge_delay=hedge_config['DEFAULT_DELAY_MS'] / 1000,
+            min_hedge_delay=hedge_config['MIN_DELAY_MS'] / 1000
+        )
+
+    async def _rpc_request(self, chain: str, method: str, params: List):
+        """Send a JSON-RPC read to the chain's fastest healthy endpoint"""
+        if chain not in self.rpc_pools:
+            raise ContractValidationError(f"Chain {chain} not supported")
+        return await self.rpc_pools[chain].request(method, params)
+
+    async def close(self):
+        """Stop health checks, close endpoint sessions and shut down detector workers"""
+        for pool in self.rpc_pools.values():
+            await pool.close()
+        self.rpc_pools.clear()
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+        REGISTRY.remove_collector(self._collect_cache_metrics)
+
+    def _collect_cache_metrics(self):
+        """Copy cache counters into gauges ahead of a metrics scrape"""
+        caches = {
+            'code_hash': self.code_hash_cache,
+            'code': self.code_cache,
+            'analysis': self.analysis_cache
+        }
+        for name, cache in caches.items():
+            CACHE_HIT_RATIO.set(cache.hit_ratio(), cache=name)
+            CACHE_LOOKUPS.set_total(cache.hits, cache=name, result='hit')
+            CACHE_LOOKUPS.set_total(cache.misses, cache=name, result='miss')
+            CACHE_ENTRIES.set(len(cache), cache=name)
 
     async def analyze_contract(self, contract_address: str, chain: str) -> Dict:
+        """Comprehensive contract analysis, shared by concurrent callers for the same contract"""
+        # Validate inputs first
+        if not self._validate_inputs(contract_address, chain):
+            return self._format_error_response("Invalid contract address or chain")
+        
+        # Concurrent requests for the same contract await a single analysis
+        key = (chain, Web3.to_checksum_address(contract_address))
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run_analysis(key[1], chain))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        
+        # Shielded so a caller that goes away doesn't cancel the analysis for the others
+        return await asyncio.shield(task)
+
+    async def _run_analysis(self, contract_address: str, chain: str) -> Dict:
         """Comprehensive contract analysis with enhanced error handling"""
         try:
-            # Validate inputs first
-            if not self._validate_inputs(contract_address, chain):
-                return self._format_error_response("Invalid contract address or chain")
-            
-            # Check web3 connection first
-            if not self._check_web3_connection(chain):
-                return self._format_error_response(
-                    f"No connection available for chain {chain}. Please check your network configuration."
-                )
-            
-            # Get contract code with retries and detailed error handling
-            contract_code = await self._get_contract_code_with_validation(contract_address, chain)
-            
-            if not contract_code:
-                return self._format_error_response(
-                    "Could not retrieve contract code. Contract may not exist or network may be unavailable.",
-                    details={
-                        "chain": chain,
-                        "contract_address": contract_address,
-                        "connection_status": self._get_connection_status(chain)
-                    }
-                )
+            contract_code, error = await self._load_contract_code(contract_address, chain)
+            if error:
+                return error
             
             # Continue with existing analysis logic...
             results = await asyncio.gather(
-                self._analyze_code_security(contract_code),
-                self._check_attack_surface(contract_address, chain),
-                self._monitor_cross_chain_activity(contract_address),
-                self._get_threat_intelligence(),
-                self._analyze_behavioral_patterns(contract_address, chain),
+                *self._analysis_stages(contract_address, chain, contract_code).values(),
                 return_exceptions=True
             )
             
@@ -105,44 +241,184 @@ class EnhancedSecurityAnalyzer:
                 details={"error_type": type(e).__name__, "error_message": str(e)}
             )
 
+    async def analyze_contract_stream(self, contract_address: str, chain: str) -> AsyncIterator[Dict]:
+        """Yield each analysis stage as it completes, followed by the overall risk score"""
+        if not self._validate_inputs(contract_address, chain):
+            yield self._format_error_response("Invalid contract address or chain")
+            return
+        contract_address = Web3.to_checksum_address(contract_address)
+        
+        try:
+            contract_code, error = await self._load_contract_code(contract_address, chain)
+        except ContractValidationError as e:
+            error = self._format_error_response(str(e))
+        except Exception as e:
+            error = self._format_error_response(
+                "Unexpected error during analysis",
+                details={"error_type": type(e).__name__, "error_message": str(e)}
+            )
+        if error:
+            yield error
+            return
+        
+        yield {'stage': 'threats', 'result': self.threat_intel.current.reference}
+        stages = self._analysis_stages(contract_address, chain, contract_code)
+        tasks = {asyncio.ensure_future(coro): name for name, coro in stages.items()}
+        results = {}
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = tasks[task]
+                    try:
+                        results[name] = task.result()
+                    except Exception as e:
+                        results[name] = {'error': str(e)}
+                    yield {'stage': name, 'result': results[name]}
+        finally:
+            # A client that disconnects mid-stream shouldn't leave stages running
+            for task in tasks:
+                task.cancel()
+        
+        yield {
+            'stage': 'risk_score',
+            'risk_score': self._calculate_overall_risk(
+                results['code_security'], results['attack_surface'], results['behavioral_analysis']
+            ),
+            'timestamp': datetime.now().isoformat()
+        }
+
+    async def _load_contract_code(self, contract_address: str, chain: str) -> Tuple[Optional[str], Optional[Dict]]:
+        """Fetch contract code, returning (code, None) or (None, error response)"""
+        # Previously fetched code needs no connection check or RPC round trip
+        contract_code = self._get_cached_code(contract_address, chain)
+        
+        if not contract_code:
+            # Check web3 connection first
+            if not await self._check_web3_connection(chain):
+                return None, self._format_error_response(
+                    f"No connection available for chain {chain}. Please check your network configuration."
+                )
+            
+            # Get contract code with retries and detailed error handling
+            with STAGE_DURATION.time(stage='fetch_code'):
+                contract_code = await self._get_contract_code_with_validation(contract_address, chain)
+        
+        if not contract_code:
+            return None, self._format_error_response(
+                "Could not retrieve contract code. Contract may not exist or network may be unavailable.",
+                details={
+                    "chain": chain,
+                    "contract_address": contract_address,
+                    "connection_status": self._get_connection_status(chain)
+                }
+            )
+        return contract_code, None
+
+    def _analysis_stages(self, contract_address: str, chain: str, code: str) -> Dict[str, Awaitable]:
+        """Independent analysis stages keyed by their name in the compiled results"""
+        stages = {
+            'code_security': self._analyze_code_security(code),
+            'attack_surface': self._check_attack_surface(contract_address, chain),
+            'cross_chain_activity': self._monitor_cross_chain_activity(contract_address),
+            'behavioral_analysis': self._analyze_behavioral_patterns(contract_address, chain),
+        }
+        return {name: self._timed_stage(name, coro) for name, coro in stages.items()}
+
+    async def _timed_stage(self, stage: str, coro: Awaitable):
+        with STAGE_DURATION.time(stage=stage):
+            return await coro
+
+    async def analyze_batch(self, contracts: List[Dict]) -> List[Dict]:
+        """Analyze many contracts concurrently, returning results in input order"""
+        # Duplicate (chain, address) pairs share a single analysis
+        tasks = {}
+        keys = []
+        for item in contracts:
+            contract_address = item.get('contract') if isinstance(item, dict) else None
+            chain = item.get('chain') if isinstance(item, dict) else None
+            if not self._validate_inputs(contract_address, chain):
+                keys.append("Invalid contract address or chain")
+                continue
+            # Unknown chains would each get a concurrency limit that's never released
+            if chain not in self.rpc_endpoints:
+                keys.append(f"Chain {chain} not supported")
+                continue
+            key = (chain, Web3.to_checksum_address(contract_address))
+            if key not in tasks:
+                tasks[key] = self._analyze_with_chain_limit(key[1], key[0])
+            keys.append(key)
+        
+        completed = dict(zip(tasks.keys(), await asyncio.gather(*tasks.values())))
+        return [
+            completed[key] if isinstance(key, tuple) else self._format_error_response(key)
+            for key in keys
+        ]
+
+    async def _analyze_with_chain_limit(self, contract_address: str, chain: str) -> Dict:
+        """Run a single analysis under the concurrency limit of its chain"""
+        limit = self._chain_limits.get(chain)
+        if limit is None:
+            limit = self._chain_limits[chain] = asyncio.Semaphore(CONFIG['BATCH']['CHAIN_CONCURRENCY'])
+        async with limit:
+            return await self.analyze_contract(contract_address, chain)
+
     async def _get_contract_code_with_validation(
         self, contract_address: str, chain: str
     ) -> Optional[str]:
-        """Get contract code with enhanced validation and retries"""
-        if chain not in self.web3_connections:
+        """Fetch contract code with enhanced validation and endpoint failover
+
+        Callers check the code cache first (see _load_contract_code), so it is
+        not consulted again here; a second lookup would double-count misses.
+        """
+        if chain not in self.rpc_pools:
             raise ContractValidationError(f"Chain {chain} not supported")
             
-        web3 = self.web3_connections[chain]
-        retry_count = 3
-        retry_delay = 1  # seconds
-        
-        for attempt in range(retry_count):
-            try:
-                # Validate address format
-                if not Web3.is_address(contract_address):
-                    raise ContractValidationError("Invalid contract address format")
-                
-                checksum_address = Web3.to_checksum_address(contract_address)
-                code = await self._safe_get_code(web3, checksum_address)
-                
-                # Check if contract exists (code length > 2 to account for "0x")
-                if not code or len(code) <= 2:
-                    return None
-                    
-                return code
-                
-            except ContractValidationError:
-                raise
-            except Exception as e:
-                if attempt == retry_count - 1:
-                    print(f"Failed to retrieve contract code after {retry_count} attempts: {e}")
-                    return None
-                await asyncio.sleep(retry_delay * (attempt + 1))
-
-    async def _safe_get_code(self, web3: Web3, address: str) -> Optional[str]:
+        # Validate address format
+        if not Web3.is_address(contract_address):
+            raise ContractValidationError("Invalid contract address format")
+        
+        checksum_address = Web3.to_checksum_address(contract_address)
+        
+        # The endpoint pool fails over immediately and skips endpoints with open
+        # circuits, so there is no sleep-and-retry loop here
+        code = await self._safe_get_code(chain, checksum_address)
+        
+        # Check if contract exists (code length > 2 to account for "0x")
+        if not code or len(code) <= 2:
+            return None
+        
+        self._cache_code(checksum_address, chain, code)
+        return code
+
+    def _code_hash(self, code: str) -> str:
+        """Keccak hash identifying a piece of runtime bytecode or source"""
+        if evm.is_bytecode(code):
+            return Web3.to_hex(Web3.keccak(hexstr=code))
+        return Web3.to_hex(Web3.keccak(text=code))
+
+    def _get_cached_code(self, contract_address: str, chain: str) -> Optional[str]:
+        """Look up previously fetched code through its (chain, address) code hash"""
+        if not Web3.is_address(contract_address):
+            return None
+        key = (chain, Web3.to_checksum_address(contract_address))
+        code_hash = self.code_hash_cache.get(key)
+        if code_hash is None:
+            return None
+        return self.code_cache.get(code_hash)
+
+    def _cache_code(self, contract_address: str, chain: str, code: str):
+        """Remember fetched code under its hash; clones share one entry"""
+        code_hash = self._code_hash(code)
+        self.code_hash_cache.set((chain, contract_address), code_hash)
+        if code_hash not in self.code_cache:
+            self.code_cache.set(code_hash, code)
+
+    async def _safe_get_code(self, chain: str, address: str) -> Optional[str]:
         """Safely retrieve contract code with timeout"""
         try:
-            return web3.eth.get_code(address).hex()
+            return await self._rpc_request(chain, 'eth_getCode', [address, 'latest'])
         except Exception as e:
             print(f"Error retrieving code: {e}")
             return None
@@ -168,38 +444,164 @@ class EnhancedSecurityAnalyzer:
             response['details'] = details
         return response
 
-    def _check_web3_connection(self, chain: str) -> bool:
+    async def _check_web3_connection(self, chain: str) -> bool:
         """Verify web3 connection status"""
-        if chain not in self.web3_connections:
-            return False
-        return self.web3_connections[chain].is_connected()
+        # Liveness comes from the pool's background health checks, not a probe per request
+        return await self._ensure_connection(chain)
 
     def _get_connection_status(self, chain: str) -> Dict:
         """Get detailed connection status"""
+        pool = self.rpc_pools.get(chain)
         return {
-            'connected': chain in self.web3_connections,
+            'connected': pool is not None and pool.healthy,
             'chain': chain,
-            'provider_url': str(self.web3_connections.get(chain, {}).provider.endpoint_uri)
-            if chain in self.web3_connections else None
+            'provider_url': pool.select().host if pool is not None else None,
+            'endpoints': pool.status() if pool is not None else []
         }
     async def _analyze_code_security(self, code: str) -> Dict:
-        """Pattern-based code security analysis"""
+        """Code security analysis: opcode detectors for bytecode, patterns for source"""
+        code_hash = self._code_hash(code)
+        cached = self.analysis_cache.get(code_hash)
+        if cached is not None:
+            return cached
+        
+        if evm.is_bytecode(code):
+            result = await self._analyze_bytecode_security(code)
+        else:
+            result = await self._analyze_source_security(code)
+        
+        result['code_hash'] = code_hash
+        # Failed runs are retried on the next request instead of being cached
+        if 'error' not in result:
+            self.analysis_cache.set(code_hash, result)
+        return result
+
+    async def _run_cpu_bound(self, size: int, func, *args):
+        """Run a CPU-bound stage in the worker pool when configured and worth it, else inline"""
+        pool = self._get_process_pool()
+        if pool is None or size < CONFIG['PROCESS_POOL']['MIN_BYTES']:
+            return func(*args)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+        except BrokenProcessPool:
+            # A worker died; reap the rest, start a fresh pool next time and finish this one inline
+            if self._process_pool is pool:
+                self._process_pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+            return func(*args)
+
+    async def start_workers(self) -> int:
+        """Spawn the detector workers ahead of the first request and return how many are running"""
+        pool = self._get_process_pool()
+        if pool is None:
+            return 0
+        # Workers spawn on demand; one concurrent task each starts them all and imports the detectors
+        loop = asyncio.get_running_loop()
+        pids = await asyncio.gather(
+            *(loop.run_in_executor(pool, workers.warm_up) for _ in range(CONFIG['PROCESS_POOL']['WORKERS']))
+        )
+        return len(set(pids))
+
+    def _get_process_pool(self) -> Optional[ProcessPoolExecutor]:
+        """Create the detector worker pool on first use, if enabled"""
+        count = CONFIG['PROCESS_POOL']['WORKERS']
+        if count <= 0:
+            return None
+        if self._process_pool is None:
+            # Spawned workers don't inherit the event loop or open HTTP sessions
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=count, mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._process_pool
+
+    async def _analyze_source_security(self, code: str) -> Dict:
+        """Pattern-based analysis of Solidity source"""
         vulnerabilities = []
         
-        # Pattern-based analysis
-        for vuln_type, pattern in self.vulnerability_patterns.items():
-            try:
-                if re.search(pattern, code):
-                    vulnerabilities.append({
-                        'type': vuln_type,
-                        'severity': self._determine_vulnerability_severity(vuln_type),
-                        'pattern_match': True,
-                        'confidence': 0.8  # Static confidence for pattern matches
-                    })
-            except Exception as e:
-                print(f"Warning: Pattern matching failed for {vuln_type}: {e}")
+        # Pattern-based analysis, all patterns in a single pass
+        try:
+            matches = await self._run_cpu_bound(
+                len(code), workers.source_findings, code, self.vulnerability_patterns,
+                CONFIG['SCANNER']['MAX_SPAN'], CONFIG['SCANNER']['MAX_REPORTED_OFFSETS']
+            )
+        except Exception as e:
+            print(f"Warning: Pattern matching failed: {e}")
+            return {
+                'vulnerabilities': vulnerabilities,
+                'analysis_method': 'source_patterns',
+                'error': 'Pattern matching failed'
+            }
+        
+        for vuln_type in self.vulnerability_patterns:
+            if vuln_type in matches:
+                match_count, offsets = matches[vuln_type]
+                vulnerabilities.append({
+                    'type': vuln_type,
+                    'severity': self._determine_vulnerability_severity(vuln_type),
+                    'pattern_match': True,
+                    'confidence': 0.8,  # Static confidence for pattern matches
+                    'match_count': match_count,
+                    'offsets': offsets
+                })
+
+        return {'vulnerabilities': vulnerabilities, 'analysis_method': 'source_patterns'}
+
+    async def _analyze_bytecode_security(self, code: str) -> Dict:
+        """Opcode-level analysis of deployed runtime bytecode"""
+        vulnerabilities = []
+        
+        try:
+            # Raw bytes are half the size of the hex string to ship to a worker
+            raw = evm.to_bytes(code)
+            findings = await self._run_cpu_bound(
+                len(raw), workers.bytecode_findings, raw,
+                {**self.opcode_detectors, **self.opcode_observations}, CONFIG['SCANNER']['MAX_REPORTED_OFFSETS']
+            )
+        except Exception as e:
+            print(f"Warning: Bytecode analysis failed: {e}")
+            return {
+                'vulnerabilities': vulnerabilities,
+                'analysis_method': 'bytecode_opcodes',
+                'error': 'Bytecode analysis failed'
+            }
+        
+        for vuln_type in self.opcode_detectors:
+            if vuln_type in findings['opcode_matches']:
+                match_count, offsets = findings['opcode_matches'][vuln_type]
+                vulnerabilities.append({
+                    'type': vuln_type,
+                    'severity': self._determine_vulnerability_severity(vuln_type),
+                    'opcode_match': True,
+                    'confidence': 0.7,  # Opcode presence, not proven exploitability
+                    'match_count': match_count,
+                    'offsets': offsets
+                })
+        
+        # Outside the vulnerabilities, so they don't dilute the averaged vulnerability risk
+        observations = []
+        for name in self.opcode_observations:
+            if name in findings['opcode_matches']:
+                match_count, offsets = findings['opcode_matches'][name]
+                observations.append({'type': name, 'match_count': match_count, 'offsets': offsets})
+        
+        match_count, offsets = findings['reentrant_calls']
+        if match_count:
+            vulnerabilities.append({
+                'type': 'reentrancy',
+                'severity': self._determine_vulnerability_severity('reentrancy'),
+                'cfg_match': True,
+                'confidence': 0.6,  # Only statically resolved jump edges are followed
+                'match_count': match_count,
+                'offsets': offsets
+            })
 
-        return {'vulnerabilities': vulnerabilities}
+        return {
+            'vulnerabilities': vulnerabilities,
+            'analysis_method': 'bytecode_opcodes',
+            'observations': observations,
+            'instruction_count': findings['instruction_count'],
+            'basic_block_count': findings['basic_block_count']
+        }
 
     def _determine_vulnerability_severity(self, vuln_type: str) -> str:
         """Determine vulnerability severity based on type"""
@@ -210,25 +612,23 @@ class EnhancedSecurityAnalyzer:
             'unchecked_external_call': 'high',
             'arbitrary_jump': 'critical',
             'delegatecall': 'critical',
-            'self_destruct': 'critical'
+            'self_destruct': 'critical',
+            'callcode': 'critical',
+            'tx_origin': 'medium'
         }
         return severity_map.get(vuln_type, 'medium')
 
     async def _get_contract_code(self, contract_address: str, chain: str) -> str:
-        """Get contract code with retries and fallbacks"""
-        if chain not in self.web3_connections:
+        """Get contract code, failing over across the chain's endpoints"""
+        if chain not in self.rpc_pools:
             raise ValueError(f"Chain {chain} not supported")
             
-        web3 = self.web3_connections[chain]
-        
-        for _ in range(3):  # Retry up to 3 times
-            try:
-                return web3.eth.get_code(Web3.to_checksum_address(contract_address)).hex()
-            except Exception as e:
-                await asyncio.sleep(1)
-                continue
-                
-        raise Exception("Could not retrieve contract code after retries")
+        try:
+            return await self._rpc_request(
+                chain, 'eth_getCode', [Web3.to_checksum_address(contract_address), 'latest']
+            )
+        except Exception as e:
+            raise Exception(f"Could not retrieve contract code: {e}")
 
     async def _check_attack_surface(self, contract_address: str, chain: str) -> Dict:
         """Analyze attack surface with error handling"""
@@ -238,10 +638,10 @@ class EnhancedSecurityAnalyzer:
             'dependencies': []
         }
         
-        if chain not in self.web3_connections:
+        if chain not in self.rpc_pools:
             return surface
             
-        web3 = self.web3_connections[chain]
+        web3 = self.rpc_pools[chain].select().web3
         
         try:
             contract = web3.eth.contract(address=contract_address)
@@ -258,10 +658,24 @@ class EnhancedSecurityAnalyzer:
             
         return surface
 
+    async def refresh_behavior(self, contract_address: str, chain: str, result: Dict) -> Dict:
+        """Re-run only the behavioral stage of a previous result and re-score it"""
+        # Code is immutable and the other stages don't depend on new blocks
+        behavior = await self._analyze_behavioral_patterns(contract_address, chain)
+        return {
+            **result,
+            'behavioral_analysis': behavior,
+            'risk_score': self._calculate_overall_risk(
+                result['code_security'], result['attack_surface'], behavior
+            ),
+            'threats': self.threat_intel.current.reference,
+            'timestamp': datetime.now().isoformat()
+        }
+
     def _compile_analysis_results(self, results: List[Dict]) -> Dict:
         """Compile analysis results with validation"""
         try:
-            [code_security, attack_surface, cross_chain, threats, behavior] = results
+            [code_security, attack_surface, cross_chain, behavior] = results
             
             risk_score = self._calculate_overall_risk(
                 code_security, attack_surface, behavior
@@ -272,7 +686,7 @@ class EnhancedSecurityAnalyzer:
                 'code_security': code_security,
                 'attack_surface': attack_surface,
                 'cross_chain_activity': cross_chain,
-                'threats': threats,
+                'threats': self.threat_intel.current.reference,
                 'behavioral_analysis': behavior,
                 'timestamp': datetime.now().isoformat()
             }
@@ -371,51 +785,39 @@ class EnhancedSecurityAnalyzer:
     
         return min(1.0, risk_score)
     
-    async def _get_threat_intelligence(self) -> Dict:
-        """Gather known threats and security intelligence"""
-        try:
-            # Initialize threats database
-            known_threats = {
-                'known_attacks': [
-                    {
-                        'type': 'flash_loan_attack',
-                        'severity': 'critical',
-                        'description': 'Flash loan-based price manipulation attacks',
-                        'indicators': ['multiple_dex_calls', 'large_borrowing']
-                    },
-                    {
-                        'type': 'front_running',
-                        'severity': 'high',
-                        'description': 'Transaction ordering exploitation',
-                        'indicators': ['high_gas_price', 'similar_transactions']
-                    },
-                    {
-                        'type': 'honeypot',
-                        'severity': 'critical',
-                        'description': 'Contracts that trap user funds',
-                        'indicators': ['restricted_withdrawals', 'hidden_fee_logic']
-                    }
-                ],
-                'recent_incidents': [],
-                'threat_indicators': {
-                    'high_risk_patterns': self.vulnerability_patterns,
-                    'suspicious_behaviors': [
-                        'unusual_gas_patterns',
-                        'frequent_ownership_changes',
-                        'irregular_activity_spikes'
-                    ]
+    def _threat_intelligence_data(self) -> Dict:
+        """Known threats and security intelligence"""
+        return {
+            'known_attacks': [
+                {
+                    'type': 'flash_loan_attack',
+                    'severity': 'critical',
+                    'description': 'Flash loan-based price manipulation attacks',
+                    'indicators': ['multiple_dex_calls', 'large_borrowing']
                 },
-                'timestamp': datetime.now().isoformat()
-            }
-        
-            return known_threats
-        
-        except Exception as e:
-            print(f"Warning: Failed to gather threat intelligence: {e}")
-            return {
-                'error': 'Failed to gather threat intelligence',
-                'timestamp': datetime.now().isoformat()
+                {
+                    'type': 'front_running',
+                    'severity': 'high',
+                    'description': 'Transaction ordering exploitation',
+                    'indicators': ['high_gas_price', 'similar_transactions']
+                },
+                {
+                    'type': 'honeypot',
+                    'severity': 'critical',
+                    'description': 'Contracts that trap user funds',
+                    'indicators': ['restricted_withdrawals', 'hidden_fee_logic']
+                }
+            ],
+            'recent_incidents': [],
+            'threat_indicators': {
+                'high_risk_patterns': self.vulnerability_patterns,
+                'suspicious_behaviors': [
+                    'unusual_gas_patterns',
+                    'frequent_ownership_changes',
+                    'irregular_activity_spikes'
+                ]
             }
+        }
 
     async def _monitor_cross_chain_activity(self, contract_address: str) -> Dict:
         """Monitor for suspicious cross-chain activities"""
@@ -452,19 +854,29 @@ class EnhancedSecurityAnalyzer:
                 'timestamp': datetime.now().isoformat()
             }
         
-            if chain in self.web3_connections:
-                web3 = self.web3_connections[chain]
-            
-                # Get recent blocks for analysis
-                latest_block = await web3.eth.get_block_number()
-            
-                # Add basic transaction pattern analysis
-                # You could expand this with more detailed analysis
-                behavior_analysis['behavioral_patterns'].append({
-                    'type': 'transaction_frequency',
-                    'severity': 0.5,
-                    'description': 'Normal transaction frequency observed'
-                })
+            if chain in self.rpc_pools:
+                # Only blocks mined since the contract's checkpoint are fetched
+                latest_block = int(await self._rpc_request(chain, 'eth_blockNumber', []), 16)
+                activity = await self.log_indexer.update(chain, contract_address, latest_block)
+                
+                behavior_analysis['behavioral_patterns'].extend(self._log_patterns(activity))
+                
+                spikes, spike_patterns = self._activity_spikes(activity)
+                behavior_analysis['activity_spikes'] = spikes
+                behavior_analysis['behavioral_patterns'].extend(spike_patterns)
+                
+                # Receipts of the contract's recent transactions feed the gas statistics
+                transactions = activity.recent_transactions(CONFIG['BEHAVIOR']['MAX_TRANSACTIONS'])
+                await self.log_indexer.update_receipts(chain, activity, transactions)
+                gas_usage, gas_patterns = self._gas_patterns(activity, transactions)
+                behavior_analysis['gas_usage_patterns'] = gas_usage
+                behavior_analysis['behavioral_patterns'].extend(gas_patterns)
+                behavior_analysis['interaction_patterns'].append(self._interaction_patterns(activity))
+                behavior_analysis['indexed_blocks'] = {
+                    'from': activity.first_block,
+                    'to': activity.checkpoint,
+                    'events': len(activity.events)
+                }
             
             return behavior_analysis
         
@@ -473,4 +885,117 @@ class EnhancedSecurityAnalyzer:
             return {
                 'error': 'Behavioral analysis failed',
                 'timestamp': datetime.now().isoformat()
-            }
\ No newline at end of file
+            }
+
+    def _log_patterns(self, activity) -> List[Dict]:
+        """Behavioral patterns derived from a contract's indexed logs"""
+        config = CONFIG['BEHAVIOR']
+        blocks = max(1, activity.block_span)
+        patterns = [{
+            'type': 'transaction_frequency',
+            'severity': 0.0,  # Informational; not weighted in the risk score
+            'events_per_1000_blocks': round(len(activity.events) * 1000 / blocks, 2),
+            'description': f"{len(activity.events)} events in the last {blocks} blocks"
+        }]
+        
+        # Transfers far above the typical size, weighted by their share of the volume moved
+        amounts = activity.transfer_amounts
+        values = amounts.values
+        if len(values) >= config['MIN_TRANSFERS']:
+            threshold = np.median(values) * config['HIGH_VALUE_FACTOR']
+            high = values > threshold
+            if threshold > 0 and high.any():
+                patterns.append({
+                    'type': 'high_value_transfers',
+                    'severity': round(float(min(1.0, values[high].sum() / values.sum())), 3),
+                    'count': int(high.sum()),
+                    'threshold': str(int(threshold)),
+                    'largest': str(amounts.exact(int(values.argmax()))),
+                    'description': f"{int(high.sum())} of {len(values)} transfers exceed "
+                                   f"{config['HIGH_VALUE_FACTOR']:g}x the median amount"
+                })
+        
+        ownership_changes = activity.topic_counts[OWNERSHIP_TRANSFERRED_TOPIC]
+        if ownership_changes > 1:
+            patterns.append({
+                'type': 'frequent_ownership_changes',
+                'severity': round(min(1.0, (ownership_changes - 1) / 4), 3),
+                'count': ownership_changes,
+                'description': f"Ownership transferred {ownership_changes} times in the last {blocks} blocks"
+            })
+        
+        return patterns
+
+    def _activity_spikes(self, activity) -> Tuple[List[Dict], List[Dict]]:
+        """Buckets of the contract's event counter far above its typical activity"""
+        config = CONFIG['BEHAVIOR']
+        counter = activity.activity_counts
+        counts = counter.series()
+        indices = detect_spikes(counts, config['SPIKE_THRESHOLD'], config['SPIKE_MIN_EVENTS'])
+        if not indices:
+            return [], []
+        
+        baseline = max(float(np.median(counts)), 1.0)
+        spikes = [
+            {
+                'from_block': counter.bucket_start(i),
+                'to_block': counter.bucket_start(i) + counter.bucket_blocks - 1,
+                'events': int(counts[i]),
+                'ratio_to_median': round(float(counts[i]) / baseline, 2)
+            }
+            for i in indices
+        ]
+        peak = max(spike['ratio_to_median'] for spike in spikes)
+        # Report the largest intervals, but count them all
+        reported = sorted(spikes, key=lambda spike: -spike['events'])[:CONFIG['SCANNER']['MAX_REPORTED_OFFSETS']]
+        return reported, [{
+            'type': 'irregular_activity_spikes',
+            # 32x the usual activity or more scores the maximum
+            'severity': round(min(1.0, float(np.log2(max(peak, 1.0))) / 5), 3),
+            'count': len(spikes),
+            'description': f"{len(spikes)} of {len(counts)} recent {counter.bucket_blocks}-block intervals "
+                           f"peaked at {peak:g}x the median activity"
+        }]
+
+    def _gas_patterns(self, activity, transactions: List[str]) -> Tuple[List[Dict], List[Dict]]:
+        """Gas statistics for gas_usage_patterns, and an unusual_gas_patterns finding if warranted"""
+        config = CONFIG['BEHAVIOR']
+        blocks, gas_used, gas_price = activity.gas_arrays(transactions)
+        if len(blocks) < config['MIN_TRANSACTIONS']:
+            return [], []
+        
+        stats = gas_anomalies(
+            blocks, gas_used, gas_price, window=config['GAS_WINDOW'],
+            z_threshold=config['GAS_Z_THRESHOLD'], fence=config['GAS_FENCE']
+        )
+        usage = [
+            {'metric': metric, 'transactions': stats['transactions'], **stats[metric]}
+            for metric in ('gas_used', 'gas_price')
+        ]
+        if not stats['outlier_count']:
+            return usage, []
+        return usage, [{
+            'type': 'unusual_gas_patterns',
+            # A few percent of transactions far outside the contract's norm is already notable
+            'severity': round(min(1.0, stats['outlier_fraction'] * 20), 3),
+            'count': stats['outlier_count'],
+            'blocks': stats['outlier_blocks'][-CONFIG['SCANNER']['MAX_REPORTED_OFFSETS']:],
+            'description': f"{stats['outlier_count']} of {stats['transactions']} transactions "
+                           f"have outlying gas used or gas price"
+        }]
+
+    def _interaction_patterns(self, activity, top: int = 5) -> Dict:
+        """Counterparty summary of indexed transfers"""
+        return {
+            'type': 'counterparties',
+            'unique_senders': len(activity.senders),
+            'unique_receivers': len(activity.receivers),
+            'top_senders': [
+                {'address': address, 'transfers': count}
+                for address, count in activity.senders.most_common(top)
+            ],
+            'top_receivers': [
+                {'address': address, 'transfers': count}
+                for address, count in activity.receivers.most_common(top)
+            ]
+        }
@@ -0,0 +1,510 @@
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from web3 import AsyncWeb3, AsyncHTTPProvider
+import asyncio
+import re
+import time
+from metrics import RPC_REQUEST_DURATION, RPC_RETRIES
+
+# How providers word a getLogs rejection for spanning too many blocks or results, e.g.
+# "query returned more than 10000 results", "Log response size exceeded",
+# "block range is too wide", "eth_getLogs is limited to a 10,000 range"
+RANGE_ERROR = re.compile(
+    r'more than \d+ (?:results|logs)|too many (?:results|logs)|response size|'
+    r'block range|range (?:is )?too (?:wide|large)|(?:max|maximum|limited to a) [\d,]*\s*(?:block )?range',
+    re.IGNORECASE
+)
+# Throttling, which a smaller range won't fix, e.g. "exceeded its compute units per second capacity"
+RATE_LIMIT_MARKERS = ('rate limit', 'capacity', 'request count', 'too many requests', 'compute units', '429')
+
+
+class RPCError(Exception):
+    """Raised when a JSON-RPC call returns an error object"""
+
+    # Errors in the request itself, which every endpoint would answer the same way
+    CLIENT_ERROR_CODES = {3, -32600, -32601, -32602, -32700}
+
+    def __init__(self, message: str, code: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+
+    @property
+    def range_limited(self) -> bool:
+        """Whether a getLogs call was rejected for its range, which a smaller one might fix"""
+        message = str(self).lower()
+        if any(marker in message for marker in RATE_LIMIT_MARKERS):
+            return False
+        return RANGE_ERROR.search(message) is not None
+
+    @property
+    def retryable(self) -> bool:
+        """Whether another endpoint might answer where this one returned an error"""
+        if self.code in self.CLIENT_ERROR_CODES or 'revert' in str(self).lower():
+            return False
+        # Splitting the range is the fix, not re-sending the same oversized query elsewhere
+        if self.range_limited:
+            return False
+        # Internal and implementation-defined server errors, e.g. -32603 or -32000 header not found
+        return self.code is None or self.code == -32603 or -32099 <= self.code <= -32000
+
+
+class CircuitOpenError(Exception):
+    """Raised without a network call when an endpoint's circuit breaker is open"""
+    pass
+
+
+class CircuitBreaker:
+    """Trips after consecutive failures and lets a single trial call through on a schedule"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 max_reset_timeout: float = 300.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._open_for = reset_timeout
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    def available(self) -> bool:
+        """Whether a call may be attempted now"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            return time.monotonic() - self._opened_at >= self._open_for
+        return not self._trial_in_flight
+
+    def acquire(self) -> bool:
+        """Claim permission for a call, moving an expired open breaker to half-open"""
+        if not self.available():
+            return False
+        if self.state == self.OPEN:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            self._trial_in_flight = True
+        return True
+
+    def release(self):
+        """Give up a claimed call without a verdict, e.g. when it was cancelled"""
+        self._trial_in_flight = False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._open_for = self.reset_timeout
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == self.HALF_OPEN:
+            # The trial failed; stay open longer before the next one
+            self._open_for = min(self._open_for * 2, self.max_reset_timeout)
+            self._trip()
+        elif self.failures >= self.failure_threshold:
+            self._trip()
+
+    def _trip(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+
+
+class RequestBatcher:
+    """Coalesce concurrent JSON-RPC reads into batch payloads for one endpoint"""
+
+    BATCHABLE_METHODS = {
+        'eth_getCode', 'eth_getStorageAt', 'eth_blockNumber', 'eth_call', 'eth_getTransactionReceipt',
+        'eth_getBlockByNumber'
+    }
+    # Calls whose cost grows with the block range asked for
+    RANGE_METHODS = {'eth_getLogs'}
+
+    def __init__(self, web3: AsyncWeb3, max_batch_size: int = 50, max_wait: float = 0.005,
+                 timeout: float = 10.0,
+                 on_response: Callable[[Optional[float], Optional[bool]], None] = lambda latency, failed: None):
+        self.web3 = web3
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.timeout = timeout
+        # Told the latency and outcome of each HTTP request, however many calls it carried;
+        # the outcome is None for a request abandoned before its answer
+        self.on_response = on_response
+        self._pending: List[Tuple[str, List, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._in_flight = set()
+        # Cleared once the endpoint rejects a batch payload; calls are then sent one at a time
+        self.batching = True
+
+    async def request(self, method: str, params: List) -> Any:
+        """Queue a call and wait for its result from the next flushed batch"""
+        if method not in self.BATCHABLE_METHODS or not self.batching:
+            return self._unwrap(await self._post(self.web3.provider.make_request(method, params), method))
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((method, params, future))
+
+        # Flush on size, otherwise after a short window to collect concurrent callers
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Send all pending calls as a single batch"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.ensure_future(self._send(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _post(self, request: Awaitable, method: Optional[str] = None) -> Any:
+        """One HTTP request to the endpoint, reporting its outcome once"""
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(request, self.timeout)
+        except asyncio.TimeoutError:
+            # A getLogs over too wide a range times out on a healthy node too
+            self.on_response(None, None if method in self.RANGE_METHODS else True)
+            raise
+        except asyncio.CancelledError:
+            # Lost a hedge race: how long it had taken so far still counts against its latency
+            self.on_response(time.perf_counter() - started, None)
+            raise
+        except Exception:
+            self.on_response(None, True)
+            raise
+        # Any JSON-RPC answer, error objects included, means the node is up
+        self.on_response(time.perf_counter() - started, False)
+        return response
+
+    async def _send(self, batch: List[Tuple[str, List, asyncio.Future]]):
+        """Post a batch payload and resolve each caller's future"""
+        try:
+            if len(batch) == 1:
+                method, params, _ = batch[0]
+                responses = [await self._post(self.web3.provider.make_request(method, params))]
+            else:
+                responses = await self._post(self.web3.provider.make_batch_request(
+                    [(method, params) for method, params, _ in batch]
+                ))
+            if not isinstance(responses, list) or len(responses) != len(batch):
+                # Providers that don't support batches answer with a single error object
+                print(f"Warning: Batch rejected, sending calls individually: {responses}")
+                self.batching = False
+                responses = await asyncio.gather(
+                    *(self._post(self.web3.provider.make_request(method, params)) for method, params, _ in batch),
+                    return_exceptions=True
+                )
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, _, future), response in zip(batch, responses):
+            if future.done():
+                continue
+            if isinstance(response, BaseException):
+                future.set_exception(response)
+                continue
+            try:
+                future.set_result(self._unwrap(response))
+            except RPCError as e:
+                future.set_exception(e)
+
+    @staticmethod
+    def _unwrap(response: Dict) -> Any:
+        """Return the result of a JSON-RPC response or raise its error"""
+        if response.get('error'):
+            error = response['error']
+            if isinstance(error, dict):
+                raise RPCError(str(error.get('message', error)), error.get('code'))
+            raise RPCError(str(error))
+        return response.get('result')
+
+
+class RPCEndpoint:
+    """A single RPC endpoint with its client, batcher and rolling health stats"""
+
+    def __init__(self, url: str, max_batch_size: int = 50, max_wait: float = 0.005,
+                 smoothing: float = 0.2, sample_size: int = 100, request_timeout: float = 10.0,
+                 breaker: Optional[CircuitBreaker] = None, chain: str = ''):
+        self.url = url
+        self.chain = chain
+        # Host only, so API keys embedded in the path never reach metric labels or status responses
+        self.host = urlsplit(url).hostname or url
+        self.request_timeout = request_timeout
+        self.breaker = breaker or CircuitBreaker()
+        # Retries are handled by the pool, so the provider fails fast
+        self.web3 = AsyncWeb3(AsyncHTTPProvider(url, exception_retry_configuration=None))
+        self.batcher = RequestBatcher(
+            self.web3, max_batch_size=max_batch_size, max_wait=max_wait,
+            timeout=request_timeout, on_response=self._record_response
+        )
+        self.smoothing = smoothing
+        self.latency: Optional[float] = None
+        self.sample_size = sample_size
+        # Recent call latencies per method, since a 50-call batch and a getCode differ by far
+        self.samples: Dict[str, deque] = {}
+        self.error_rate = 0.0
+        self.block_number: Optional[int] = None
+        self.healthy = False
+
+    def record(self, latency: Optional[float], error: Optional[bool] = False):
+        """Fold one call outcome into the exponentially weighted averages; None leaves the error rate"""
+        if latency is not None:
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += self.smoothing * (latency - self.latency)
+        if error is not None:
+            self.error_rate += self.smoothing * (float(error) - self.error_rate)
+
+    def _record_response(self, latency: Optional[float], failed: bool):
+        """Health and breaker bookkeeping, once per HTTP request rather than per queued call"""
+        self.record(latency, error=failed)
+        if failed is None:
+            # Abandoned, so there's no verdict for the breaker, only a lower bound on latency
+            return
+        if failed:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def latency_percentile(self, method: str, percentile: float) -> Optional[float]:
+        """Latency at the given percentile of recent calls of one method"""
+        samples = self.samples.get(method)
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+    async def request(self, method: str, params: List) -> Any:
+        """Send a call through the batcher; its HTTP request records the endpoint's health"""
+        if not self.breaker.acquire():
+            raise CircuitOpenError(f"Circuit open for {self.host}")
+
+        started = time.perf_counter()
+        outcome = 'ok'
+        try:
+            return await self.batcher.request(method, params)
+        except RPCError:
+            outcome = 'rpc_error'
+            raise
+        except asyncio.CancelledError:
+            # Lost a hedge race before any verdict on the endpoint
+            outcome = 'cancelled'
+            self.breaker.release()
+            raise
+        except Exception:
+            outcome = 'error'
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            if outcome != 'error':
+                # A cancelled call's elapsed time is a lower bound, so a slow endpoint keeps losing races
+                self.samples.setdefault(method, deque(maxlen=self.sample_size)).append(elapsed)
+            RPC_REQUEST_DURATION.observe(
+                elapsed, chain=self.chain, endpoint=self.host, method=method, outcome=outcome
+            )
+
+    async def probe(self, timeout: float) -> bool:
+        """Measure a direct eth_blockNumber round trip"""
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(
+                self.web3.provider.make_request('eth_blockNumber', []), timeout
+            )
+            self.block_number = int(RequestBatcher._unwrap(response), 16)
+        except Exception:
+            self.record(None, error=True)
+            return False
+        self.record(time.perf_counter() - started)
+        return True
+
+    def status(self) -> Dict:
+        """Current health snapshot for diagnostics"""
+        return {
+            'host': self.host,
+            'healthy': self.healthy,
+            'latency_ms': round(self.latency * 1000, 2) if self.latency is not None else None,
+            'error_rate': round(self.error_rate, 3),
+            'block_number': self.block_number,
+            'circuit': self.breaker.state
+        }
+
+    async def close(self):
+        await self.web3.provider.disconnect()
+
+
+class EndpointPool:
+    """Per-chain endpoints routed to the fastest healthy one, refreshed in the background"""
+
+    # Cheap idempotent point reads; range scans and bulk receipt fetches are too costly to send twice
+    HEDGEABLE_METHODS = {'eth_getCode', 'eth_getStorageAt', 'eth_blockNumber', 'eth_call'}
+
+    def __init__(self, chain: str, urls: List[str], probe_timeout: float = 5.0,
+                 health_interval: float = 15.0, max_error_rate: float = 0.5,
+                 max_block_lag: int = 5, max_batch_size: int = 50, max_wait: float = 0.005,
+                 hedge: bool = False, hedge_percentile: float = 95.0,
+                 hedge_delay: float = 0.1, min_hedge_delay: float = 0.01,
+                 min_hedge_samples: int = 20, request_timeout: float = 10.0,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.chain = chain
+        self.endpoints = [
+            RPCEndpoint(
+                url, max_batch_size, max_wait,
+                request_timeout=request_timeout,
+                breaker=CircuitBreaker(failure_threshold, reset_timeout),
+                chain=chain
+            )
+            for url in urls
+        ]
+        self.probe_timeout = probe_timeout
+        self.health_interval = health_interval
+        self.max_error_rate = max_error_rate
+        self.max_block_lag = max_block_lag
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.min_hedge_samples = min_hedge_samples
+        self._health_task: Optional[asyncio.Task] = None
+
+    @property
+    def healthy(self) -> bool:
+        return any(endpoint.healthy and endpoint.breaker.available() for endpoint in self.endpoints)
+
+    async def check_health(self):
+        """Probe every endpoint concurrently and refresh the healthy set"""
+        results = await asyncio.gather(
+            *(endpoint.probe(self.probe_timeout) for endpoint in self.endpoints)
+        )
+        heights = [e.block_number for e, ok in zip(self.endpoints, results) if ok]
+        best_height = max(heights) if heights else None
+
+        for endpoint, ok in zip(self.endpoints, results):
+            # A node far behind the others serves stale state
+            lagging = ok and best_height - endpoint.block_number > self.max_block_lag
+            endpoint.healthy = ok and not lagging and endpoint.error_rate < self.max_error_rate
+
+    def start(self):
+        """Start the background health check loop"""
+        if self._health_task is None:
+            self._health_task = asyncio.ensure_future(self._health_loop())
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.check_health()
+            except Exception as e:
+                print(f"Warning: Health check failed for {self.chain}: {e}")
+
+    def ranked(self) -> List[RPCEndpoint]:
+        """Endpoints ordered available first, then healthy, then by rolling latency"""
+        return sorted(
+            self.endpoints,
+            key=lambda e: (
+                not e.breaker.available(),
+                not e.healthy,
+                e.latency if e.latency is not None else float('inf')
+            )
+        )
+
+    def select(self) -> RPCEndpoint:
+        """The endpoint new calls should go to"""
+        return self.ranked()[0]
+
+    async def request(self, method: str, params: List) -> Any:
+        """Send a call to the best endpoint, failing over to the next on transport errors"""
+        # Endpoints with an open circuit are skipped without a network call
+        ranked = [endpoint for endpoint in self.ranked() if endpoint.breaker.available()]
+        if not ranked:
+            raise CircuitOpenError(f"All endpoints for {self.chain} have open circuits")
+        if self.hedge and method in self.HEDGEABLE_METHODS and len(ranked) > 1 and ranked[1].healthy:
+            return await self._hedged_request(ranked, method, params)
+        return await self._failover_request(ranked, method, params)
+
+    async def _failover_request(self, ranked: List[RPCEndpoint], method: str, params: List) -> Any:
+        last_error = None
+        for attempt, endpoint in enumerate(ranked):
+            if attempt:
+                RPC_RETRIES.inc(chain=self.chain, method=method, reason='failover')
+            try:
+                return await endpoint.request(method, params)
+            except RPCError as e:
+                # Deterministic errors would come back the same from every endpoint
+                if not e.retryable:
+                    raise
+                last_error = e
+            except Exception as e:
+                # The caller narrows a range scan that timed out instead of waiting on each endpoint for it
+                if isinstance(e, asyncio.TimeoutError) and method in RequestBatcher.RANGE_METHODS:
+                    raise
+                last_error = e
+                if endpoint.error_rate >= self.max_error_rate:
+                    endpoint.healthy = False
+        raise last_error
+
+    def _hedge_delay(self, endpoint: RPCEndpoint, method: str) -> float:
+        """How long to wait on an endpoint before sending the backup call"""
+        if len(endpoint.samples.get(method, ())) < self.min_hedge_samples:
+            return self.hedge_delay
+        return max(self.min_hedge_delay, endpoint.latency_percentile(method, self.hedge_percentile))
+
+    async def _hedged_request(self, ranked: List[RPCEndpoint], method: str, params: List) -> Any:
+        """Send to the primary, add a backup call once it is slower than usual, first answer wins"""
+        primary, backup = ranked[0], ranked[1]
+        first = asyncio.ensure_future(primary.request(method, params))
+        done, _ = await asyncio.wait({first}, timeout=self._hedge_delay(primary, method))
+
+        if done:
+            error = first.exception()
+            if error is None or (isinstance(error, RPCError) and not error.retryable):
+                return first.result()
+            # The primary failed outright rather than being slow; fail over as usual
+            RPC_RETRIES.inc(chain=self.chain, method=method, reason='failover')
+            return await self._failover_request(ranked[1:], method, params)
+
+        RPC_RETRIES.inc(chain=self.chain, method=method, reason='hedge')
+        pending = {first, asyncio.ensure_future(backup.request(method, params))}
+        last_error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    error = task.exception()
+                    if error is None or (isinstance(error, RPCError) and not error.retryable):
+                        return task.result()
+                    last_error = error
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def status(self) -> List[Dict]:
+        return [endpoint.status() for endpoint in self.endpoints]
+
+    async def close(self):
+        """Stop health checks and close every endpoint session"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for endpoint in self.endpoints:
+            await endpoint.close()
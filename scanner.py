@@ -0,0 +1,160 @@
+from typing import Dict, List, Optional, Tuple
+import re
+
+try:
+    from re import _parser as sre_parse
+    from re._constants import AT, BRANCH, IN, LITERAL, SUBPATTERN
+except ImportError:  # Python < 3.11
+    import sre_parse
+    from sre_constants import AT, BRANCH, IN, LITERAL, SUBPATTERN
+
+MAX_PREFIXES = 64
+
+
+def _literal_prefixes(items) -> Tuple[List[str], bool]:
+    """Literal strings one of which every match must start with, and whether they cover the whole pattern"""
+    prefixes = ['']
+    for op, av in items:
+        if op is AT:
+            # Anchors such as word boundaries are zero-width; verification enforces them
+            continue
+        if op is LITERAL:
+            alternatives, complete = [chr(av)], True
+        elif op is IN and all(kind is LITERAL for kind, _ in av):
+            alternatives, complete = [chr(value) for _, value in av], True
+        elif op is SUBPATTERN:
+            alternatives, complete = _literal_prefixes(av[-1])
+        elif op is BRANCH:
+            branches = [_literal_prefixes(branch) for branch in av[1]]
+            alternatives = [prefix for found, _ in branches for prefix in found]
+            complete = all(branch_complete for _, branch_complete in branches)
+        else:
+            return prefixes, False
+
+        prefixes = [prefix + alternative for prefix in prefixes for alternative in alternatives]
+        if not complete or len(prefixes) > MAX_PREFIXES:
+            return prefixes, False
+    return prefixes, True
+
+
+def _required_literals(items) -> List[str]:
+    """Literal runs that every match must contain, taken from the top level of the pattern"""
+    if len(items) == 1 and items[0][0] is SUBPATTERN:
+        return _required_literals(items[0][1][-1])
+
+    literals = []
+    run = ''
+    for op, av in items:
+        if op is LITERAL:
+            run += chr(av)
+        elif op is not AT:
+            if run:
+                literals.append(run)
+            run = ''
+    if run:
+        literals.append(run)
+    return literals
+
+
+class MultiPatternScanner:
+    """Precompiled scanner that finds every match of many patterns in one pass over the input
+
+    Each pattern is reduced to the literal prefixes its matches must start with. A
+    single combined trigger expression walks the input once, and a pattern is only
+    evaluated, anchored, at offsets where one of its prefixes occurs and all of its
+    other required literals still occur within reach. Verification is bounded to
+    max_span characters so lazy `.*?` patterns cannot go quadratic.
+    """
+
+    def __init__(self, patterns: Dict[str, str], max_span: int = 4096):
+        self.max_span = max_span
+        self.patterns = {name: re.compile(pattern) for name, pattern in patterns.items()}
+        self._candidates: Dict[str, List[str]] = {}
+        self._fallback: List[str] = []
+        self._required: Dict[str, List[str]] = {}
+
+        for name, compiled in self.patterns.items():
+            self._required[name] = self._required_for(compiled)
+            prefixes = self._prefixes_for(compiled)
+            if prefixes is None:
+                self._fallback.append(name)
+                continue
+            for prefix in prefixes:
+                self._candidates.setdefault(prefix, []).append(name)
+
+        # A trigger also selects every pattern whose prefix is a prefix of it
+        literals = sorted(self._candidates, key=len, reverse=True)
+        self._trigger_patterns = {
+            literal: [
+                name for prefix in literals if literal.startswith(prefix)
+                for name in self._candidates[prefix]
+            ]
+            for literal in literals
+        }
+        self._trigger: Optional[re.Pattern] = None
+        if literals:
+            # Zero-width lookahead so overlapping triggers are all reported
+            self._trigger = re.compile(
+                '(?=(' + '|'.join(re.escape(literal) for literal in literals) + '))'
+            )
+
+    @staticmethod
+    def _prefixes_for(compiled: re.Pattern) -> Optional[List[str]]:
+        try:
+            prefixes, _ = _literal_prefixes(sre_parse.parse(compiled.pattern, compiled.flags))
+        except Exception:
+            return None
+        if compiled.flags & re.IGNORECASE or not prefixes or '' in prefixes:
+            return None
+        return prefixes
+
+    @staticmethod
+    def _required_for(compiled: re.Pattern) -> List[str]:
+        if compiled.flags & re.IGNORECASE:
+            return []
+        try:
+            return _required_literals(sre_parse.parse(compiled.pattern, compiled.flags))
+        except Exception:
+            return []
+
+    def scan(self, code: str) -> Dict[str, List[int]]:
+        """Return the start offsets of all matches, keyed by pattern name"""
+        matches: Dict[str, List[int]] = {}
+        length = len(code)
+        # Next occurrence of each required literal; triggers arrive in order, so this only moves forward
+        next_literal: Dict[str, int] = {}
+        # End of each pattern's last match; like finditer, a match can't start inside the previous one
+        match_end: Dict[str, int] = {}
+
+        if self._trigger is not None:
+            for trigger in self._trigger.finditer(code):
+                position = trigger.start()
+                endpos = min(length, position + self.max_span)
+                for name in self._trigger_patterns[trigger.group(1)]:
+                    if position < match_end.get(name, 0):
+                        continue
+                    if not self._literals_within(code, name, position, endpos, next_literal):
+                        continue
+                    match = self.patterns[name].match(code, position, endpos)
+                    if match:
+                        matches.setdefault(name, []).append(position)
+                        match_end[name] = match.end()
+
+        # Patterns without a usable literal prefix fall back to a dedicated scan
+        for name in self._fallback:
+            offsets = [match.start() for match in self.patterns[name].finditer(code)]
+            if offsets:
+                matches[name] = offsets
+
+        return matches
+
+    def _literals_within(self, code: str, name: str, position: int, endpos: int,
+                         next_literal: Dict[str, int]) -> bool:
+        """Cheap check that a pattern's required literals occur in the verification window"""
+        for literal in self._required[name]:
+            found = next_literal.get(literal, -2)
+            if found != -1 and found < position:
+                found = next_literal[literal] = code.find(literal, position)
+            if found == -1 or found + len(literal) > endpos:
+                return False
+        return True
@@ -0,0 +1,78 @@
+import sys
+import random
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import evm
+
+
+def reference_pcs(code: bytes) -> list:
+    """Instruction starts by stepping over PUSH immediates one instruction at a time"""
+    pcs = []
+    pc = 0
+    while pc < len(code):
+        pcs.append(pc)
+        opcode = code[pc]
+        pc += 1 + (opcode - evm.PUSH1 + 1 if evm.PUSH1 <= opcode <= evm.PUSH32 else 0)
+    return pcs
+
+
+def random_code(rng: random.Random, size: int, push_share: float = 0.3) -> bytes:
+    code = bytearray()
+    while len(code) < size:
+        if rng.random() < push_share:
+            code.append(rng.randint(evm.PUSH1, evm.PUSH32))
+        else:
+            code.append(rng.choice([op for op in range(256) if not evm.PUSH1 <= op <= evm.PUSH32]))
+    return bytes(code[:size])
+
+
+class InstructionMaskTest(unittest.TestCase):
+
+    def assertSameInstructions(self, code: bytes):
+        mask = evm.instruction_mask(np.frombuffer(code, dtype=np.uint8))
+        self.assertEqual(np.flatnonzero(mask).tolist(), reference_pcs(code), code.hex())
+
+    def test_matches_linear_walk(self):
+        rng = random.Random(0)
+        for size in [*range(0, 70), 255, 256, 257, 1000, 4096, 24576]:
+            for push_share in (0.0, 0.3, 1.0):
+                self.assertSameInstructions(random_code(rng, size, push_share))
+
+    def test_push_data_running_past_the_end(self):
+        self.assertSameInstructions(bytes([evm.PUSH32, 1, 2, 3]))
+        self.assertSameInstructions(bytes([evm.CALL, evm.PUSH1 + 1, evm.PUSH1]))
+
+    def test_opcodes_inside_push_data_are_ignored(self):
+        code = bytes([evm.PUSH1 + 1, evm.DELEGATECALL, evm.SELFDESTRUCT, evm.CALL, evm.STOP])
+        disassembly = evm.Disassembly(code)
+        self.assertEqual(disassembly.pcs.tolist(), [0, 3, 4])
+        self.assertEqual(
+            evm.detect_opcodes(disassembly, {'call': [evm.CALL], 'delegatecall': [evm.DELEGATECALL]}).keys(),
+            {'call'}
+        )
+        self.assertEqual(disassembly.push_value(0), (evm.DELEGATECALL << 8) | evm.SELFDESTRUCT)
+
+
+class DisassemblyTest(unittest.TestCase):
+
+    def test_strips_solc_metadata(self):
+        body = bytes([evm.PUSH1, 0x80, evm.STOP])
+        metadata = bytes([0xa2, 0x64]) + b'ipfs' + bytes(8)
+        code = body + metadata + len(metadata).to_bytes(2, 'big')
+        disassembly = evm.Disassembly('0x' + code.hex())
+        self.assertEqual(disassembly.raw.tobytes(), body)
+        self.assertEqual(disassembly.pcs.tolist(), [0, 2])
+
+    def test_rejects_non_hex(self):
+        self.assertTrue(evm.is_bytecode('0x6080f1'))
+        self.assertFalse(evm.is_bytecode('pragma solidity ^0.8.0;'))
+        self.assertFalse(evm.is_bytecode('0x60 80'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import sys
+import asyncio
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent / 'benchmarks'))
+
+from indexer import LogIndexer
+from mock_rpc import JSONRPCError, MockChain
+from rpc import RPCError
+
+TOKEN = '0x4000000000000000000000000000000000000004'
+
+# (provider, message, code, whether a smaller range might succeed)
+RANGE_ERRORS = [
+    ('infura', "query returned more than 10000 results. Try with this block range [0x1, 0x7f].", -32005, True),
+    ('alchemy', "Log response size exceeded. You can make eth_getLogs requests with up to a 2K block range and "
+                "no limit on the response size, or you can request any block range with a cap of 10K logs in "
+                "the response. Based on your parameters, this block range should work: [0x1, 0x7f]", -32602, True),
+    ('alchemy', "Log response size exceeded. You can make eth_getLogs requests with up to a 2K block range and "
+                "no limit on the response size, or you can request any block range with a cap of 10K logs in "
+                "the response.", -32602, True),
+    ('alchemy', "Under the Free tier plan, you can make eth_getLogs requests with up to a 10 block range.",
+     -32600, True),
+    ('quicknode', "eth_getLogs is limited to a 10,000 range", -32614, True),
+    ('mock', "block range is too wide, max is 500 blocks", -32005, True),
+    ('mock', "query returned more than 500 results", -32005, True),
+    ('generic', "too many logs in response", -32000, True),
+    ('alchemy', "Your app has exceeded its compute units per second capacity. If you have retries enabled, "
+                "you can safely ignore this message.", 429, False),
+    ('infura', "project ID request rate exceeded", -32005, False),
+    ('generic', "Too many requests, rate limit reached for block range queries", -32005, False),
+    ('geth', "header not found", -32000, False),
+    ('geth', "execution reverted", 3, False),
+]
+
+# (message, range asked for, expected sub-ranges, whether they follow the provider)
+SPLITS = [
+    ("query returned more than 10000 results. Try with this block range [0x1, 0x7f].", (1, 1000),
+     [(1, 127), (128, 1000)], True),
+    # A suggestion outside the range asked for is ignored
+    ("query returned more than 10000 results. Try with this block range [0x1, 0x2000].", (1, 1000),
+     [(1, 500), (501, 1000)], False),
+    ("Log response size exceeded. You can make eth_getLogs requests with up to a 2K block range and no "
+     "limit on the response size, or you can request any block range with a cap of 10K logs in the "
+     "response.", (1, 5000), [(1, 2000), (2001, 4000), (4001, 5000)], True),
+    ("Under the Free tier plan, you can make eth_getLogs requests with up to a 10 block range.", (1, 25),
+     [(1, 10), (11, 20), (21, 25)], True),
+    ("block range is too wide, max is 500 blocks", (1, 1200), [(1, 500), (501, 1000), (1001, 1200)], True),
+    # Already within the stated limit, so the limit isn't the problem; bisect
+    ("block range is too wide, max is 500 blocks", (1, 400), [(1, 200), (201, 400)], False),
+    ("eth_getLogs is limited to a 10,000 range", (1, 20000), [(1, 10000), (10001, 20000)], False),
+    ("query returned more than 500 results", (1, 10), [(1, 5), (6, 10)], False),
+]
+
+
+def mock_indexer(**limits):
+    """An indexer whose getLogs calls go straight to an in-process mock chain"""
+    chain = MockChain({
+        'block_number': 2000,
+        'transfers': [{'address': TOKEN, 'from_block': 1, 'to_block': 2000, 'per_block': 3}]
+    }, **limits)
+    calls = []
+
+    async def request(chain_name, method, params):
+        calls.append((int(params[0]['fromBlock'], 16), int(params[0]['toBlock'], 16)))
+        try:
+            return chain.call(method, params)
+        except JSONRPCError as e:
+            raise RPCError(e.message, e.code)
+
+    return LogIndexer(request, lookback_blocks=2000, confirmations=0, initial_range=2000), calls
+
+
+class RangeErrorTest(unittest.TestCase):
+
+    def test_classifies_provider_messages(self):
+        for provider, message, code, expected in RANGE_ERRORS:
+            with self.subTest(provider=provider, message=message):
+                error = RPCError(message, code)
+                self.assertEqual(LogIndexer._is_range_error(error), expected)
+                # Range errors go back to the indexer to split instead of failing over
+                if expected:
+                    self.assertFalse(error.retryable)
+
+    def test_timeouts_are_range_errors(self):
+        self.assertTrue(LogIndexer._is_range_error(asyncio.TimeoutError()))
+        self.assertFalse(LogIndexer._is_range_error(ConnectionError("reset by peer")))
+
+    def test_splits_where_the_provider_says(self):
+        for message, (start, end), ranges, guided in SPLITS:
+            with self.subTest(message=message, start=start, end=end):
+                indexer = LogIndexer(lambda chain, method, params: None)
+                self.assertEqual(indexer._split('ethereum', start, end, RPCError(message)), (ranges, guided))
+
+    def test_block_limit_caps_later_pages(self):
+        indexer = LogIndexer(lambda chain, method, params: None, max_range=10000)
+        indexer._split('ethereum', 1, 5000, RPCError("block range is too wide, max is 500 blocks"))
+        self.assertEqual(indexer._range_cap('ethereum'), 500)
+        self.assertEqual(indexer._range_cap('bsc'), 10000)
+
+    def test_result_limit_is_learned(self):
+        indexer = LogIndexer(lambda chain, method, params: None)
+        indexer._split('ethereum', 1, 10, RPCError("query returned more than 500 results"))
+        self.assertEqual(indexer.result_limit, 500)
+
+
+class MockLimitTest(unittest.TestCase):
+
+    def fetch(self, **limits):
+        indexer, calls = mock_indexer(**limits)
+        logs = asyncio.run(indexer.fetch_logs('ethereum', TOKEN, 1, 2000))
+        return logs, calls, indexer
+
+    def test_max_logs_bisects_to_every_log(self):
+        expected, _, _ = self.fetch()
+        logs, calls, indexer = self.fetch(max_logs=500)
+        self.assertEqual(logs, expected)
+        self.assertEqual(len(logs), 6000)
+        self.assertGreater(len(calls), 1)
+        self.assertEqual(indexer.result_limit, 500)
+
+    def test_max_log_range_follows_the_stated_limit(self):
+        expected, _, _ = self.fetch()
+        logs, calls, indexer = self.fetch(max_log_range=300)
+        self.assertEqual(logs, expected)
+        # One rejected call, then pages of exactly the stated width
+        self.assertEqual(calls[0], (1, 2000))
+        self.assertTrue(all(end - start + 1 <= 300 for start, end in calls[1:]))
+        self.assertEqual(len(calls), 1 + 7)
+        self.assertEqual(indexer._range_cap('ethereum'), 300)
+
+    def test_persistent_range_errors_stop_at_the_split_depth(self):
+        indexer, calls = mock_indexer(max_logs=0)
+        indexer.max_split_depth = 3
+        with self.assertRaises(RPCError):
+            asyncio.run(indexer.fetch_logs('ethereum', TOKEN, 1, 2000))
+        self.assertEqual(len(calls), 2 ** 4 - 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
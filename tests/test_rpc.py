@@ -0,0 +1,190 @@
+import sys
+import asyncio
+import unittest
+from collections import deque
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from rpc import CircuitBreaker, EndpointPool, RPCEndpoint, RPCError
+
+
+class FakeProvider:
+    """Answers single and batch calls from a script, counting HTTP requests"""
+
+    def __init__(self, fail: bool = False, error: dict = None, delay: float = 0.0):
+        self.fail = fail
+        self.error = error
+        self.delay = delay
+        self.requests = 0
+
+    def _answer(self, method):
+        if self.error:
+            return {'jsonrpc': '2.0', 'id': 1, 'error': self.error}
+        return {'jsonrpc': '2.0', 'id': 1, 'result': '0x1'}
+
+    async def make_request(self, method, params):
+        self.requests += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("503 Service Unavailable")
+        return self._answer(method)
+
+    async def make_batch_request(self, calls):
+        self.requests += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("503 Service Unavailable")
+        return [self._answer(method) for method, _ in calls]
+
+
+def endpoint_with(provider: FakeProvider, **kwargs) -> RPCEndpoint:
+    endpoint = RPCEndpoint('http://127.0.0.1:1', **kwargs)
+    endpoint.batcher.web3 = SimpleNamespace(provider=provider)
+    endpoint.healthy = True
+    return endpoint
+
+
+def pool_with(*providers: FakeProvider) -> EndpointPool:
+    """A pool whose endpoints rank in the order given"""
+    pool = EndpointPool('ethereum', [f'http://127.0.0.1:{port}' for port in range(1, len(providers) + 1)])
+    pool.endpoints = [endpoint_with(provider) for provider in providers]
+    for latency, endpoint in enumerate(pool.endpoints):
+        endpoint.latency = float(latency)
+    return pool
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def test_trips_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30.0)
+        for _ in range(2):
+            breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.acquire())
+
+    def test_success_resets_failure_count(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_allows_one_trial(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+        breaker.record_failure()
+        self.assertTrue(breaker.acquire())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(breaker.acquire())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+
+class EndpointBreakerTest(unittest.TestCase):
+
+    def test_failed_batch_counts_as_one_failure(self):
+        provider = FakeProvider(fail=True)
+        endpoint = endpoint_with(provider, max_wait=0.01)
+        endpoint.breaker.failure_threshold = 5
+
+        async def run():
+            return await asyncio.gather(
+                *(endpoint.request('eth_getCode', [f'0x{i:040x}', 'latest']) for i in range(10)),
+                return_exceptions=True
+            )
+
+        results = asyncio.run(run())
+        self.assertTrue(all(isinstance(result, ConnectionError) for result in results))
+        self.assertEqual(provider.requests, 1)
+        self.assertEqual(endpoint.breaker.failures, 1)
+        self.assertEqual(endpoint.breaker.state, CircuitBreaker.CLOSED)
+        self.assertAlmostEqual(endpoint.error_rate, endpoint.smoothing)
+
+    def test_rpc_error_keeps_circuit_closed(self):
+        endpoint = endpoint_with(FakeProvider(error={'code': -32602, 'message': 'invalid params'}))
+        endpoint.breaker.failure_threshold = 1
+        with self.assertRaises(RPCError):
+            asyncio.run(endpoint.request('eth_getCode', ['0x0', 'latest']))
+        self.assertEqual(endpoint.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(endpoint.error_rate, 0.0)
+
+
+class FailoverTest(unittest.TestCase):
+
+    def test_server_error_fails_over(self):
+        first = FakeProvider(error={'code': -32000, 'message': 'header not found'})
+        second = FakeProvider()
+        pool = pool_with(first, second)
+        self.assertEqual(asyncio.run(pool.request('eth_getLogs', [{}])), '0x1')
+        self.assertEqual((first.requests, second.requests), (1, 1))
+
+    def test_range_error_is_not_retried(self):
+        first = FakeProvider(error={'code': -32005, 'message': 'query returned more than 10000 results'})
+        second = FakeProvider()
+        pool = pool_with(first, second)
+        with self.assertRaises(RPCError):
+            asyncio.run(pool.request('eth_getLogs', [{}]))
+        self.assertEqual(second.requests, 0)
+
+    def test_range_timeout_is_not_retried_or_counted(self):
+        first, second = FakeProvider(delay=0.05), FakeProvider()
+        pool = pool_with(first, second)
+        pool.endpoints[0].batcher.timeout = 0.01
+        pool.endpoints[0].breaker.failure_threshold = 1
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(pool.request('eth_getLogs', [{}]))
+        self.assertEqual(second.requests, 0)
+        self.assertEqual(pool.endpoints[0].breaker.state, CircuitBreaker.CLOSED)
+
+    def test_client_error_is_not_retried(self):
+        first = FakeProvider(error={'code': 3, 'message': 'execution reverted'})
+        second = FakeProvider()
+        pool = pool_with(first, second)
+        with self.assertRaises(RPCError):
+            asyncio.run(pool.request('eth_call', [{}, 'latest']))
+        self.assertEqual(second.requests, 0)
+
+
+class HedgeTest(unittest.TestCase):
+
+    def hedged_pool_with(self, *providers: FakeProvider) -> EndpointPool:
+        pool = pool_with(*providers)
+        pool.hedge = True
+        pool.hedge_delay = 0.01
+        return pool
+
+    def test_slow_primary_is_hedged_and_loses_rank(self):
+        slow, fast = FakeProvider(delay=0.2), FakeProvider()
+        pool = self.hedged_pool_with(slow, fast)
+        for endpoint in pool.endpoints:
+            endpoint.batcher.batching = False
+        primary = pool.endpoints[0]
+        primary.latency = 0.001
+        self.assertEqual(asyncio.run(pool.request('eth_getCode', ['0x0', 'latest'])), '0x1')
+        self.assertEqual((slow.requests, fast.requests), (1, 1))
+        # The abandoned call's elapsed time is recorded, without a verdict for the breaker
+        self.assertEqual(len(primary.samples['eth_getCode']), 1)
+        self.assertGreater(primary.latency, 0.001)
+        self.assertEqual(primary.error_rate, 0.0)
+        self.assertEqual(primary.breaker.failures, 0)
+
+    def test_range_scans_are_not_hedged(self):
+        slow, fast = FakeProvider(delay=0.05), FakeProvider()
+        pool = self.hedged_pool_with(slow, fast)
+        self.assertEqual(asyncio.run(pool.request('eth_getLogs', [{}])), '0x1')
+        self.assertEqual((slow.requests, fast.requests), (1, 0))
+
+    def test_delay_follows_the_method(self):
+        pool = self.hedged_pool_with(FakeProvider(), FakeProvider())
+        pool.min_hedge_samples = 1
+        endpoint = pool.endpoints[0]
+        endpoint.samples = {'eth_getCode': deque([0.02]), 'eth_getTransactionReceipt': deque([2.0])}
+        self.assertEqual(pool._hedge_delay(endpoint, 'eth_getCode'), 0.02)
+        self.assertEqual(pool._hedge_delay(endpoint, 'eth_call'), pool.hedge_delay)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import sys
+import random
+import re
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from scanner import MultiPatternScanner
+
+# The analyzer's source patterns, plus shapes that exercise prefix extraction and the fallback scan
+PATTERNS = {
+    'reentrancy': r'(\.\bcall\b[^{\n]*{.*?[\w\.]\.transfer\()',
+    'overflow': r'(\+|\-|\*|\/(?!/))(?![^{]*})(?![^\[]*\])',
+    'timestamp_dependency': r'\b(block\.(timestamp|number)|now)\b',
+    'unchecked_external_call': r'\.call\{.*?\}',
+    'arbitrary_jump': r'\bassembly\b.*?\bjump\b',
+    'delegatecall': r'\.delegatecall\(',
+    'self_destruct': r'\bselfdestruct\b|\bsuicide\b',
+    'tx_origin': r'tx\.origin\s*==',
+    'case_insensitive': r'(?i)owner',
+    'no_prefix': r'\w+\.send\(',
+}
+
+FRAGMENTS = [
+    'a.call{value: v}("")', '.call{', '}', '{', '[', ']', 'x.transfer(y)', 'block.timestamp', 'block.number',
+    'now', 'nowhere', 'a + b', 'c - d', 'e * f', 'g / h', '// note', '/* c */', 'selfdestruct(o)', 'suicide',
+    'suicides', 'assembly', 'jump(x)', 'jumpi', 'p.delegatecall(d)', 'tx.origin == o', 'Owner', 'OWNER',
+    'to.send(1)', '\n', ' ', ';', 'function f()', 'require(', ')',
+]
+
+
+def random_source(rng: random.Random, fragments: int) -> str:
+    return ''.join(rng.choice(FRAGMENTS) for _ in range(fragments))
+
+
+class MultiPatternScannerTest(unittest.TestCase):
+
+    def assertMatchesRegex(self, scanner: MultiPatternScanner, code: str):
+        expected = {}
+        for name, pattern in PATTERNS.items():
+            offsets = [match.start() for match in re.finditer(pattern, code)]
+            if offsets:
+                expected[name] = offsets
+        self.assertEqual(scanner.scan(code), expected, code)
+
+    def test_same_offsets_as_finditer(self):
+        scanner = MultiPatternScanner(PATTERNS, max_span=100000)
+        rng = random.Random(0)
+        for _ in range(2000):
+            self.assertMatchesRegex(scanner, random_source(rng, rng.randrange(1, 40)))
+
+    def test_overlapping_candidates(self):
+        scanner = MultiPatternScanner(PATTERNS, max_span=100000)
+        for code in ['.call{.call{}}', 'assembly assembly jump jump', 'nownow now', '.call{ x.transfer(.call{ y.transfer(']:
+            self.assertMatchesRegex(scanner, code)
+
+    def test_uses_fallback_only_where_needed(self):
+        scanner = MultiPatternScanner(PATTERNS)
+        self.assertEqual(sorted(scanner._fallback), ['case_insensitive', 'no_prefix'])
+
+    def test_span_bounds_lazy_patterns(self):
+        scanner = MultiPatternScanner({'unchecked_external_call': r'\.call\{.*?\}'}, max_span=16)
+        self.assertEqual(scanner.scan('.call{' + 'x' * 5 + '}'), {'unchecked_external_call': [0]})
+        self.assertEqual(scanner.scan('.call{' + 'x' * 50 + '}'), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+"""Versioned threat-intelligence snapshots, serialized once and served as-is
+
+A snapshot never changes after it is built: updates replace it with a new
+one. Its version is a hash of the content, so analysis results can refer to
+the intel they were scored against by version instead of embedding a copy,
+and HTTP clients can revalidate with If-None-Match.
+"""
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, NamedTuple, Optional
+import hashlib
+import json
+
+
+class ThreatIntelSnapshot(NamedTuple):
+    """Threat intel as pre-serialized JSON bytes, with its content version"""
+    version: str
+    body: bytes
+    created_at: str
+
+    @classmethod
+    def build(cls, data: Dict) -> 'ThreatIntelSnapshot':
+        content = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+        version = hashlib.sha256(content.encode()).hexdigest()[:16]
+        created_at = datetime.now().isoformat()
+        body = json.dumps({**data, 'version': version, 'timestamp': created_at}, default=str)
+        return cls(version, body.encode(), created_at)
+
+    @property
+    def etag(self) -> str:
+        # Weak, since the timestamp in the body differs between builds of the same content
+        return f'W/"{self.version}"'
+
+    @property
+    def reference(self) -> Dict:
+        return {'version': self.version, 'timestamp': self.created_at}
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """Whether an If-None-Match header already names this snapshot"""
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or any(tag.removeprefix('W/') == f'"{self.version}"' for tag in tags)
+
+
+class ThreatIntelStore:
+    """The current snapshot, plus recent ones so versions cited in results still resolve"""
+
+    def __init__(self, data: Dict, history: int = 8):
+        self.history = history
+        self._snapshots: OrderedDict = OrderedDict()
+        self.current = self.update(data)
+
+    def update(self, data: Dict) -> ThreatIntelSnapshot:
+        """Publish new intel, returning the existing snapshot when the content is unchanged"""
+        snapshot = ThreatIntelSnapshot.build(data)
+        if snapshot.version in self._snapshots:
+            snapshot = self._snapshots[snapshot.version]
+        self._snapshots[snapshot.version] = snapshot
+        self._snapshots.move_to_end(snapshot.version)
+        while len(self._snapshots) > self.history:
+            self._snapshots.popitem(last=False)
+        # A single reference swap, so readers see either the old snapshot or the new one
+        self.current = snapshot
+        return snapshot
+
+    def get(self, version: str) -> Optional[ThreatIntelSnapshot]:
+        return self._snapshots.get(version)
@@ -0,0 +1,214 @@
+"""Continuous monitoring of watched contracts, re-scored only when new blocks touch them
+
+One poller per chain checks the head once per interval for every contract
+watched on that chain. Header logsBloom filters of the new confirmed blocks
+rule out most contracts, and the rest are confirmed with one multi-address
+getLogs query; only contracts that emitted logs re-run their behavioral
+stage, and everything else keeps its last result. Results are held in memory, ready to serve.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+import asyncio
+from web3 import Web3
+
+
+class WatchEntry:
+    """A watched contract and its most recent analysis"""
+
+    def __init__(self, chain: str, address: str):
+        self.chain = chain
+        self.address = address
+        self.result: Optional[Dict] = None
+        self.updated_at: Optional[str] = None
+        self.last_touched_block: Optional[int] = None
+        self.refreshes = 0
+
+    @property
+    def needs_full_analysis(self) -> bool:
+        return self.result is None or 'error' in self.result or 'code_security' not in self.result
+
+    def status(self) -> Dict:
+        return {
+            'chain': self.chain,
+            'contract': self.address,
+            'risk_score': None if self.needs_full_analysis else self.result.get('risk_score'),
+            'updated_at': self.updated_at,
+            'last_touched_block': self.last_touched_block,
+            'refreshes': self.refreshes,
+            'error': self.result.get('error') if self.result else None
+        }
+
+
+class Watchlist:
+    """Watched contracts per chain, polled in the background and refreshed incrementally"""
+
+    def __init__(self, analyzer, poll_interval: float = 12.0, max_contracts: int = 1000,
+                 refresh_concurrency: int = 8, address_chunk: int = 100):
+        self.analyzer = analyzer
+        self.poll_interval = poll_interval
+        self.max_contracts = max_contracts
+        self.address_chunk = address_chunk
+        self.refresh_concurrency = refresh_concurrency
+        self._entries: Dict[Tuple[str, str], WatchEntry] = {}
+        # Last confirmed block already checked for touches, per chain
+        self._cursors: Dict[str, int] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # First analyses of contracts being added, which concurrent adds of the same one wait for
+        self._pending: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._loader: Optional[asyncio.Task] = None
+        self._poll_locks: Dict[str, asyncio.Lock] = {}
+        self._limit = asyncio.Semaphore(refresh_concurrency)
+
+    async def add(self, chain: str, contract_address: str) -> Dict:
+        """Watch a contract, analyzing it in full once"""
+        if not self.analyzer._validate_inputs(contract_address, chain):
+            raise ValueError("Invalid contract address or chain")
+        if chain not in self.analyzer.rpc_endpoints:
+            raise ValueError(f"Chain {chain} not supported")
+        key = (chain, Web3.to_checksum_address(contract_address))
+        entry = self._entries.get(key)
+        pending = self._pending.get(key)
+        if pending is None:
+            if entry is not None:
+                return entry.status()
+            if len(self._entries) >= self.max_contracts:
+                raise ValueError(f"Watchlist is limited to {self.max_contracts} contracts")
+            # Reserved before any await, so concurrent adds count towards the limit and
+            # the same contract is analyzed once, by whichever add came first
+            entry = self._entries[key] = WatchEntry(*key)
+            pending = self._pending[key] = asyncio.ensure_future(self._watch(entry))
+        await asyncio.shield(pending)
+        return entry.status()
+
+    async def add_all(self, contracts: List[Tuple[str, str]]):
+        """Watch many contracts, analyzing at most refresh_concurrency of them at a time"""
+        limit = asyncio.Semaphore(self.refresh_concurrency)
+
+        async def add(chain: str, contract_address: str):
+            async with limit:
+                try:
+                    await self.add(chain, contract_address)
+                except Exception as e:
+                    print(f"Warning: Could not watch {contract_address} on {chain}: {e}")
+
+        await asyncio.gather(*(add(chain, contract_address) for chain, contract_address in contracts))
+
+    def start(self, contracts: List[Tuple[str, str]]):
+        """Add contracts in the background, so startup doesn't wait for their analyses"""
+        self._loader = asyncio.ensure_future(self.add_all(contracts))
+
+    async def _watch(self, entry: WatchEntry):
+        key = (entry.chain, entry.address)
+        try:
+            head = await self._confirmed_head(entry.chain)
+            self._cursors.setdefault(entry.chain, head)
+            await self._refresh(entry)
+        except BaseException:
+            # Nothing polls an entry until its chain's poller starts, so don't leave it behind
+            self.remove(*key)
+            raise
+        finally:
+            self._pending.pop(key, None)
+        if key in self._entries:
+            self._start(entry.chain)
+
+    def remove(self, chain: str, contract_address: str) -> bool:
+        key = (chain, Web3.to_checksum_address(contract_address))
+        if self._entries.pop(key, None) is None:
+            return False
+        if not any(entry.chain == chain for entry in self._entries.values()):
+            task = self._tasks.pop(chain, None)
+            if task is not None:
+                task.cancel()
+            self._cursors.pop(chain, None)
+        return True
+
+    def get(self, chain: str, contract_address: str) -> Optional[Dict]:
+        """Latest status and full result of a watched contract"""
+        entry = self._entries.get((chain, Web3.to_checksum_address(contract_address)))
+        if entry is None:
+            return None
+        return {**entry.status(), 'result': entry.result}
+
+    def scores(self) -> List[Dict]:
+        return [entry.status() for entry in self._entries.values()]
+
+    def _start(self, chain: str):
+        if chain not in self._tasks:
+            self._tasks[chain] = asyncio.ensure_future(self._poll_loop(chain))
+
+    async def _poll_loop(self, chain: str):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.poll(chain)
+            except Exception as e:
+                print(f"Warning: Watchlist poll failed for {chain}: {e}")
+
+    async def poll(self, chain: str) -> List[str]:
+        """Refresh the chain's contracts touched since the last poll, returning their addresses"""
+        # Overlapping polls would search the same blocks and refresh the same contracts twice
+        async with self._poll_locks.setdefault(chain, asyncio.Lock()):
+            return await self._poll(chain)
+
+    async def _poll(self, chain: str) -> List[str]:
+        # Contracts still being added get their first analysis from add()
+        entries = [
+            entry for key, entry in self._entries.items() if entry.chain == chain and key not in self._pending
+        ]
+        if not entries:
+            return []
+        safe_head = await self._confirmed_head(chain)
+        cursor = self._cursors.get(chain, safe_head)
+        if safe_head <= cursor:
+            return []
+
+        touched = await self._touched(chain, entries, cursor + 1, safe_head)
+        # Entries whose last analysis failed are retried in full on every new block
+        stale = [entry for entry in entries if entry.needs_full_analysis and entry not in touched]
+        for entry in touched:
+            entry.last_touched_block = safe_head
+        await asyncio.gather(*(self._refresh(entry) for entry in [*touched, *stale]))
+        self._cursors[chain] = safe_head
+        return [entry.address for entry in touched]
+
+    async def _confirmed_head(self, chain: str) -> int:
+        await self.analyzer._ensure_connection(chain)
+        head = int(await self.analyzer._rpc_request(chain, 'eth_blockNumber', []), 16)
+        # Same depth the log indexer waits for, so a touch is always visible to its refresh
+        return head - self.analyzer.log_indexer.confirmations
+
+    async def _touched(self, chain: str, entries: List[WatchEntry], start: int, end: int) -> List[WatchEntry]:
+        """Entries that emitted logs in [start, end]"""
+        indexer = self.analyzer.log_indexer
+        if end - start + 1 > indexer.lookback_blocks:
+            # After a long pause a full incremental refresh is cheaper than searching the gap
+            return entries
+        candidates = [entry.address for entry in entries]
+        if end - start + 1 <= indexer.bloom_max_blocks:
+            # Header blooms rule out most contracts; their refreshes reuse the same cached headers
+            passing = await indexer.bloom_candidates(chain, candidates, start, end)
+            candidates = [address for address in candidates if address in passing]
+        emitters: Set[str] = set()
+        for offset in range(0, len(candidates), self.address_chunk):
+            addresses = candidates[offset:offset + self.address_chunk]
+            logs = await indexer.fetch_logs(chain, addresses, start, end)
+            emitters.update(log['address'].lower() for log in logs)
+        return [entry for entry in entries if entry.address.lower() in emitters]
+
+    async def _refresh(self, entry: WatchEntry):
+        async with self._limit:
+            if entry.needs_full_analysis:
+                result = await self.analyzer.analyze_contract(entry.address, entry.chain)
+            else:
+                result = await self.analyzer.refresh_behavior(entry.address, entry.chain, entry.result)
+        entry.result = result
+        entry.updated_at = datetime.now().isoformat()
+        entry.refreshes += 1
+
+    async def close(self):
+        if self._loader is not None:
+            self._loader.cancel()
+        for task in [*self._tasks.values(), *self._pending.values()]:
+            task.cancel()
+        self._tasks.clear()
@@ -0,0 +1,47 @@
+"""CPU-bound detector stages, run inline or in worker processes
+
+Everything here is a module-level function of picklable arguments, so the
+analyzer can hand it to a ProcessPoolExecutor. Caches are per process.
+"""
+from typing import Dict, List, Tuple
+import os
+import numpy as np
+import evm
+from scanner import MultiPatternScanner
+
+_scanners = {}
+
+
+def warm_up() -> int:
+    """Nothing but the import of this module, returning the worker's process id"""
+    return os.getpid()
+
+
+def _summarize(offsets, max_offsets: int) -> Tuple[int, List[int]]:
+    """Match count plus the first offsets, keeping results small to send back"""
+    if isinstance(offsets, np.ndarray):
+        return len(offsets), offsets[:max_offsets].tolist()
+    return len(offsets), offsets[:max_offsets]
+
+
+def bytecode_findings(code: bytes, detectors: Dict[str, List[int]], max_offsets: int) -> Dict:
+    """Opcode detector and CFG reentrancy matches for runtime bytecode"""
+    # Built once and shared by every detector; results are cached per code hash by the analyzer
+    cfg = evm.ControlFlowGraph(evm.Disassembly(code))
+    matches = evm.detect_opcodes(cfg.disassembly, detectors)
+    return {
+        'opcode_matches': {name: _summarize(pcs, max_offsets) for name, pcs in matches.items()},
+        'reentrant_calls': _summarize(cfg.calls_before_state_write(), max_offsets),
+        'instruction_count': len(cfg.disassembly),
+        'basic_block_count': len(cfg)
+    }
+
+
+def source_findings(code: str, patterns: Dict[str, str], max_span: int,
+                    max_offsets: int) -> Dict[str, Tuple[int, List[int]]]:
+    """Pattern matches for Solidity source, using a scanner compiled once per process"""
+    key = (tuple(patterns.items()), max_span)
+    scanner = _scanners.get(key)
+    if scanner is None:
+        scanner = _scanners[key] = MultiPatternScanner(patterns, max_span=max_span)
+    return {name: _summarize(offsets, max_offsets) for name, offsets in scanner.scan(code).items()}